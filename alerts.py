@@ -0,0 +1,171 @@
+"""Expiry alerts for every household, computed outside the Streamlit app.
+
+Run as ``python alerts.py`` next to the app, against the same
+SMARTEXPIRE_DATABASE_URL. On a Postgres deployment it needs a role that
+bypasses the row-level security policies in schema.sql. Each scan walks
+the items table (joined to item_info) in keyset-paginated batches ordered
+by household. It flags each batch's expired and expiring-soon rows in one
+vectorized pass, using the app's per-mode urgency thresholds, and sends
+one digest per household to a sink. Only one batch and one household's
+digest are held in memory at a time.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from inventory import URGENCY_THRESHOLDS
+from storage import DATABASE_URL, connect
+
+BATCH_SIZE = int(os.environ.get("SMARTEXPIRE_ALERT_BATCH_SIZE", 10_000))
+ALERT_INTERVAL = float(os.environ.get("SMARTEXPIRE_ALERT_INTERVAL", 6 * 3600))
+ALERT_FILE = os.environ.get(
+    "SMARTEXPIRE_ALERT_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "expiry-alerts.jsonl"),
+)
+
+logger = logging.getLogger(__name__)
+
+# Items are due on their expiry or use-by date, whichever comes first
+_COLUMNS = ("i.user_id, i.id, i.name, i.category, i.mode, i.quantity, i.expiry_date, f.use_by "
+            "FROM items i LEFT JOIN item_info f ON f.item_id = i.id")
+_FIRST_PAGE = f"SELECT {_COLUMNS} ORDER BY i.user_id, i.id LIMIT ?"
+_NEXT_PAGE = f"SELECT {_COLUMNS} WHERE (i.user_id, i.id) > (?, ?) ORDER BY i.user_id, i.id LIMIT ?"
+
+# Per-mode "soon" thresholds by mode code; unknown modes get the last
+# entry, the grocery threshold
+_MODE_CODES = {mode: code for code, mode in enumerate(URGENCY_THRESHOLDS)}
+_SOON_DAYS = np.array([soon for soon, _ in URGENCY_THRESHOLDS.values()] + [URGENCY_THRESHOLDS["grocery"][0]])
+
+
+class JsonLinesSink:
+    """Appends each digest to a file as one JSON object per line."""
+
+    def __init__(self, path=ALERT_FILE):
+        self.path = path
+
+    def send(self, digest):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(digest) + "\n")
+
+
+class QueueSink:
+    """Puts digests on a queue.Queue (or anything with `put`)."""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def send(self, digest):
+        self.queue.put(digest)
+
+
+def _dates(values):
+    return np.array([None if value is None else str(value)[:10] for value in values], dtype="datetime64[D]")
+
+
+def flag_batch(rows, today):
+    """Rows of one page that are expired or expiring soon, as
+    (row index, days left) arrays, in the page's household order."""
+    _, _, _, _, modes, _, expiry, use_by = zip(*rows)
+    due = np.fmin(_dates(expiry), _dates(use_by))
+    days_left = (due - np.datetime64(today, "D")).astype("int64")
+    mode_codes = np.array([_MODE_CODES.get(mode, len(_MODE_CODES)) for mode in modes])
+    flagged = np.flatnonzero(~np.isnat(due) & (days_left <= _SOON_DAYS[mode_codes]))
+    return flagged, days_left[flagged]
+
+
+class ExpiryScanner:
+    """Scans all items once per `scan` and sends per-household digests."""
+
+    def __init__(self, pool, placeholder="?", sink=None, batch_size=BATCH_SIZE):
+        self.pool = pool
+        self.placeholder = placeholder
+        self.sink = sink or JsonLinesSink()
+        self.batch_size = batch_size
+
+    def _pages(self):
+        key = None
+        while True:
+            with self.pool.connection() as conn:
+                cur = conn.cursor()
+                if key is None:
+                    cur.execute(_FIRST_PAGE.replace("?", self.placeholder), (self.batch_size,))
+                else:
+                    cur.execute(_NEXT_PAGE.replace("?", self.placeholder), (*key, self.batch_size))
+                rows = cur.fetchall()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < self.batch_size:
+                return
+            key = (rows[-1][0], rows[-1][1])
+
+    def scan(self, today=None):
+        """One pass over every item; returns (items scanned, digests sent)."""
+        today = today or datetime.date.today()
+        scanned = sent = 0
+        digest = None
+        for rows in self._pages():
+            scanned += len(rows)
+            flagged, days_left = flag_batch(rows, today)
+            for index, days in zip(flagged.tolist(), days_left.tolist()):
+                user_id, item_id, name, category, mode, quantity = rows[index][:6]
+                # Households are contiguous, even across pages
+                if digest is None or digest["user_id"] != str(user_id):
+                    sent += self._send(digest)
+                    digest = {"user_id": str(user_id), "date": today.isoformat(), "expired": 0, "expiring": 0,
+                              "items": []}
+                digest["expired" if days < 0 else "expiring"] += 1
+                digest["items"].append({"id": str(item_id), "name": name, "category": category, "mode": mode,
+                                        "quantity": quantity, "days_left": days})
+        sent += self._send(digest)
+        return scanned, sent
+
+    def _send(self, digest):
+        if digest is None:
+            return 0
+        digest["items"].sort(key=lambda item: item["days_left"])
+        self.sink.send(digest)
+        return 1
+
+    def run_forever(self, interval=ALERT_INTERVAL):
+        while True:
+            start = time.monotonic()
+            try:
+                scanned, sent = self.scan()
+                logger.info("Scanned %d items, sent %d digests in %.1fs", scanned, sent, time.monotonic() - start)
+            except Exception:
+                logger.exception("Expiry scan failed; retrying next interval")
+            time.sleep(max(0.0, interval - (time.monotonic() - start)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=DATABASE_URL, help="database URL (default: SMARTEXPIRE_DATABASE_URL)")
+    parser.add_argument("--out", default=ALERT_FILE, help="JSON lines file the digests are appended to")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--interval", type=float, default=ALERT_INTERVAL, help="seconds between scans")
+    parser.add_argument("--once", action="store_true", help="scan once and exit")
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("no database configured; pass --url or set SMARTEXPIRE_DATABASE_URL")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    pool, placeholder = connect(args.url, size=1)
+    scanner = ExpiryScanner(pool, placeholder, JsonLinesSink(args.out), args.batch_size)
+    try:
+        if args.once:
+            scanned, sent = scanner.scan()
+            logger.info("Scanned %d items, sent %d digests", scanned, sent)
+        else:
+            scanner.run_forever(args.interval)
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
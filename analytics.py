@@ -0,0 +1,132 @@
+"""Consumption statistics over the used-items history.
+
+ConsumptionStats keeps running totals per mode and per mode and week:
+quantity used by category, how many items with a known expiry date were
+used after it, and the receipt value of items used in time. A Used event
+adds to a handful of counters, so the Home stats never rescan the history;
+a history loaded in bulk is folded in with one groupby.
+"""
+import datetime
+import re
+from collections import Counter
+
+import pandas as pd
+
+# Used events carry these optional fields on top of the used-items columns
+EXPIRY_FIELD = "Expiry Date"
+PRICE_FIELD = "Price"
+
+# Running totals kept per mode and per (mode, week)
+TOTALS = ["used", "checked", "wasted", "recovered"]
+
+
+def normalize_name(name):
+    return " ".join(re.findall(r"[a-z0-9]+", str(name).lower()))
+
+
+# normalize_name for a whole column
+def normalize_names(names):
+    return names.astype("string").str.lower().str.replace(r"[^a-z0-9]+", " ", regex=True).str.strip()
+
+
+def week_start(date):
+    date = pd.Timestamp(date).date()
+    return date - datetime.timedelta(days=date.weekday())
+
+
+class PriceBook:
+    """Latest unit price seen on a receipt, by normalized item name."""
+
+    def __init__(self):
+        self._prices = {}
+
+    def __len__(self):
+        return len(self._prices)
+
+    # Receipt lines as parsed: the price is for the whole line
+    def add(self, rows):
+        for row in rows:
+            if row.get("Price"):
+                self._prices[normalize_name(row["Item"])] = row["Price"] / max(int(row.get("Quantity") or 1), 1)
+
+    def price(self, name):
+        return self._prices.get(normalize_name(name))
+
+
+class ConsumptionStats:
+    """Incremental usage, waste and recovered-spend totals.
+
+    "used" is the quantity used. "checked" counts used items whose expiry
+    date is known, and "wasted" those of them used after it; the waste
+    rate is wasted / checked. "recovered" is the receipt value of checked
+    items used in time. Items without a price still count towards usage
+    and the waste rate.
+    """
+
+    def __init__(self):
+        self._usage = Counter()  # (mode, category, week) -> quantity used
+        self._weekly = Counter()  # (mode, week, total) -> value
+        self._totals = Counter()  # (mode, total) -> value
+
+    def _add(self, mode, week, total, value):
+        self._weekly[mode, week, total] += value
+        self._totals[mode, total] += value
+
+    def record(self, mode, category, quantity, used_on, expiry=None, price=None):
+        week = week_start(used_on)
+        self._usage[mode, category, week] += quantity
+        self._add(mode, week, "used", quantity)
+        if expiry is None or pd.isna(expiry):
+            return
+        self._add(mode, week, "checked", 1)
+        if pd.Timestamp(used_on) > pd.Timestamp(expiry):
+            self._add(mode, week, "wasted", 1)
+        elif price:
+            self._add(mode, week, "recovered", price * quantity)
+
+    # Used-item records as appended to the log
+    def record_many(self, records):
+        for r in records:
+            self.record(r["Type"], r["Category"], r["Quantity"], r["Used On"], r.get(EXPIRY_FIELD), r.get(PRICE_FIELD))
+
+    # A typed used-items frame, e.g. the stored history or an imported chunk
+    def record_frame(self, df):
+        if df.empty:
+            return
+        df = df.assign(Week=df["Used On"].dt.to_period("W-SUN").dt.start_time.dt.date)
+        for (mode, category, week), quantity in df.groupby(["Type", "Category", "Week"], observed=True)["Quantity"].sum().items():
+            self._usage[mode, category, week] += int(quantity)
+        columns = {"used": df["Quantity"].astype("int64")}
+        if EXPIRY_FIELD in df:
+            expiry = pd.to_datetime(df[EXPIRY_FIELD])
+            in_time = df["Used On"] <= expiry
+            price = pd.to_numeric(df.get(PRICE_FIELD), errors="coerce") if PRICE_FIELD in df else 0.0
+            columns.update(checked=expiry.notna().astype("int64"), wasted=(df["Used On"] > expiry).astype("int64"),
+                           recovered=(in_time * df["Quantity"] * price).fillna(0.0))
+        sums = pd.DataFrame(columns).groupby([df["Type"], df["Week"]], observed=True).sum()
+        for (mode, week), row in sums.iterrows():
+            for total, value in row.items():
+                self._add(mode, week, total, float(value) if total == "recovered" else int(value))
+
+    def summary(self, mode, weeks=None, today=None):
+        """Totals for one mode, all-time or over the last `weeks` weeks
+        (this week included), with the waste rate (None if nothing used
+        had a known expiry date)."""
+        if weeks is None:
+            totals = {total: self._totals[mode, total] for total in TOTALS}
+        else:
+            this_week = week_start(today or datetime.date.today())
+            starts = [this_week - datetime.timedelta(weeks=n) for n in range(weeks)]
+            totals = {total: sum(self._weekly[mode, week, total] for week in starts) for total in TOTALS}
+        totals["waste_rate"] = totals["wasted"] / totals["checked"] if totals["checked"] else None
+        return totals
+
+    def weekly_usage(self, mode, categories, weeks=8, today=None):
+        """Quantity used per category (columns) for each of the last
+        `weeks` weeks (rows, oldest first)."""
+        this_week = week_start(today or datetime.date.today())
+        starts = [this_week - datetime.timedelta(weeks=n) for n in reversed(range(weeks))]
+        return pd.DataFrame(
+            [[self._usage[mode, category, week] for category in categories] for week in starts],
+            index=pd.Index(starts, name="Week"), columns=categories,
+        )
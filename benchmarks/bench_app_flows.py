@@ -0,0 +1,222 @@
+"""Rerun latency and peak memory of the app's common flows as the inventory grows.
+
+Usage: python benchmarks/bench_app_flows.py [--sizes 10 1000 10000 100000] [--repeats 5]
+
+Drives smart.py headlessly with Streamlit's AppTest. Each size runs in its
+own process, seeded with that many synthetic inventory rows and as many
+used items, spread over the five modes. The scripted flows are page
+navigation in every mode, adding an item, marking one used, recipe search
+and a receipt upload whose OCR text is pre-seeded in a scratch OCR cache,
+so tesseract isn't needed. Reports rerun latency percentiles per step and
+each process's peak RSS, and exits non-zero if any p95 is over the budget.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+APP = os.path.join(ROOT, "smart.py")
+PAGES = ["Home", "My List", "Recommendations", "My Hub"]
+MODE_LABELS = {"grocery": "Grocery", "pharmacy": "Pharmacy", "cosmetics": "Cosmetics",
+               "cleaning": "Cleaning Supplies", "pet_care": "Pet Care"}
+SEARCHES = ["eggs", "milk", "panckes", "mushroom pasta", "chick"]
+RECEIPT_TEXT = "FRESH MART\nSemi Skimmed Milk 1.15\nFree Range Eggs x12 2.80\nSourdough Loaf 2.10\nTOTAL 6.05\n"
+
+
+def synthetic_inventory(size, rng):
+    from inventory import CATEGORIES, MODES, typed_inventory, typed_used_items
+    import pandas as pd
+
+    today = datetime.date.today()
+    modes = [MODES[i % len(MODES)] for i in range(size)]
+    categories = [rng.choice(CATEGORIES[mode]) for mode in modes]
+    expiry = [today + datetime.timedelta(days=rng.randint(-5, 365)) for _ in range(size)]
+    items = typed_inventory(pd.DataFrame({
+        "Item": [f"{category} item {i}" for i, category in enumerate(categories)],
+        "Category": categories,
+        "Quantity": [rng.randint(1, 12) for _ in range(size)],
+        "Purchase Date": [today - datetime.timedelta(days=rng.randint(0, 30)) for _ in range(size)],
+        "Expiry Date": expiry,
+        "Opened": [rng.random() < 0.3 for _ in range(size)],
+        "Calories": [rng.randint(0, 500) if mode == "grocery" else 0 for mode in modes],
+        "Storage": "Store in a cool, dry place",
+        "Notes": "",
+        "Type": modes,
+        "Best Before": expiry,
+        "Use By": [date + datetime.timedelta(days=2) for date in expiry],
+        "Best Stored": "",
+    }))
+    used = typed_used_items(pd.DataFrame({
+        "Item": [f"{category} used {i}" for i, category in enumerate(categories)],
+        "Category": categories,
+        "Quantity": 1,
+        "Used On": [today - datetime.timedelta(days=rng.randint(0, 90)) for _ in range(size)],
+        "Used In": "Not specified",
+        "Notes": "",
+        "Type": modes,
+    }))
+    return items, used
+
+
+def receipt_image(n):
+    from PIL import Image
+
+    # A distinct image per upload so every one is a new receipt
+    image = Image.new("RGB", (64, 96), (255, 255, 255))
+    image.putpixel((n % 64, n // 64 % 96), (0, 0, 0))
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+class App:
+    """One AppTest session with the option menu replaced by a settable page."""
+
+    def __init__(self, items, used):
+        import streamlit_option_menu
+        from streamlit.testing.v1 import AppTest
+
+        from inventory import Inventory, UsedItemsLog
+
+        self.page = "Home"
+        # The menu is a custom component, which AppTest can't click
+        streamlit_option_menu.option_menu = lambda *args, **kwargs: self.page
+        self.at = AppTest.from_file(APP, default_timeout=600)
+        self.at.session_state["inventory"] = Inventory(items)
+        self.at.session_state["used_items"] = UsedItemsLog(used)
+        self.samples = {}
+
+    def run(self, step, page=None):
+        self.page = page or self.page
+        start = time.perf_counter()
+        self.at.run()
+        self.samples.setdefault(step, []).append((time.perf_counter() - start) * 1000)
+        if self.at.exception:
+            raise RuntimeError(f"{step}: {self.at.exception[0].message}")
+
+    def widget(self, kind, label=None, key_prefix=None):
+        for widget in getattr(self.at, kind):
+            if (label is None or widget.label == label) and (key_prefix is None or (widget.key or "").startswith(key_prefix)):
+                return widget
+        raise LookupError(f"No {kind} {label or key_prefix!r} on {self.page}")
+
+    def set_mode(self, mode):
+        if self.at.session_state["mode"] != mode:
+            self.widget("selectbox", "Select Mode").set_value(MODE_LABELS[mode])
+            self.run("switch mode")
+
+    # Full run of a page. After a fragment rerun AppTest only holds that
+    # fragment's elements, so flows start here rather than reusing the tree.
+    def open(self, page, mode="grocery"):
+        self.run(f"open {page}", page)
+        self.set_mode(mode)
+
+
+def navigate(app, repeat):
+    for mode in MODE_LABELS:
+        for page in PAGES:
+            app.open(page, mode)
+
+
+def add_item(app, repeat):
+    app.open("My List")
+    app.widget("text_input", "Item Name").set_value(f"Benchmark item {repeat}")
+    app.widget("button", "Add Item").click()
+    app.run("add item")
+
+
+def mark_used(app, repeat):
+    app.open("My List")
+    app.widget("button", key_prefix="used_").click()
+    app.run("mark used")
+
+
+def recipe_search(app, repeat):
+    app.open("Recommendations")
+    app.widget("text_input", "Search Item").set_value(SEARCHES[repeat % len(SEARCHES)])
+    app.run("recipe search")
+
+
+def receipt_upload(app, repeat):
+    from receipts import OcrCache, receipt_digest
+
+    data = receipt_image(repeat)
+    OcrCache().put(receipt_digest(data), RECEIPT_TEXT)
+    app.open("My Hub")
+    app.widget("file_uploader").upload(f"receipt-{repeat}.png", data, "image/png")
+    app.run("upload receipt")
+    app.widget("button", key_prefix="receipt_import_").click()
+    app.run("import receipt")
+
+
+FLOWS = [navigate, add_item, mark_used, recipe_search, receipt_upload]
+
+
+def worker(size, repeats, seed):
+    items, used = synthetic_inventory(size, random.Random(seed))
+    app = App(items, used)
+    app.run("first run")
+    for repeat in range(repeats):
+        for flow in FLOWS:
+            flow(app, repeat)
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    json.dump({"size": size, "peak_rss": peak, "samples": app.samples}, sys.stdout)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 100000],
+                        help="inventory rows (and used items) per run, spread over all modes")
+    parser.add_argument("--repeats", type=int, default=5, help="times each flow is scripted per size")
+    parser.add_argument("--budget-ms", type=float, default=2000.0, help="p95 rerun latency budget per step")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        worker(args.worker, args.repeats, args.seed)
+        return
+
+    over_budget = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {name: value for name, value in os.environ.items()
+               if name not in ("SMARTEXPIRE_DATABASE_URL", "SMARTEXPIRE_PROFILE")}
+        env.update(SMARTEXPIRE_OCR_CACHE_DIR=os.path.join(tmp, "ocr"), SMARTEXPIRE_RECEIPT_DIR=os.path.join(tmp, "receipts"),
+                   SMARTEXPIRE_OCR_WORKERS="0")
+        print(f"{'rows':>7} {'step':22} {'runs':>5} {'p50':>9} {'p95':>9} {'max':>9}")
+        for size in args.sizes:
+            result = subprocess.run(
+                [sys.executable, __file__, "--worker", str(size), "--repeats", str(args.repeats), "--seed", str(args.seed)],
+                env=env, cwd=ROOT, capture_output=True, text=True)
+            if result.returncode:
+                sys.exit(f"{size} rows: benchmark failed\n{result.stderr}")
+            report = json.loads(result.stdout)
+            for step, latencies in report["samples"].items():
+                p95 = percentile(latencies, 0.95)
+                print(f"{size:>7} {step:22} {len(latencies):>5} {percentile(latencies, 0.50):6.1f} ms "
+                      f"{p95:6.1f} ms {max(latencies):6.1f} ms")
+                if p95 > args.budget_ms and step != "first run":
+                    over_budget.append(f"{size} rows, {step}: p95 {p95:.0f} ms")
+            print(f"{size:>7} {'peak RSS':22} {'':>5} {report['peak_rss'] / 2 ** 20:6.0f} MB\n")
+    if over_budget:
+        sys.exit(f"Over the {args.budget_ms:.0f} ms budget:\n" + "\n".join(over_budget))
+
+
+if __name__ == "__main__":
+    main()
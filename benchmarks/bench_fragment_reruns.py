@@ -0,0 +1,174 @@
+"""Server CPU per interaction: whole-script reruns vs fragment reruns.
+
+Usage: python benchmarks/bench_fragment_reruns.py [--items 500] [--clicks 30]
+
+Starts `streamlit run smart.py` against a seeded SQLite inventory, connects
+over the app's websocket the way a browser does, and clicks buttons inside
+the page fragments. Each click is sent twice: scoped to its fragment (what
+the browser sends now) and as a whole-script rerun (what every click cost
+before the pages were split into fragments). Server CPU comes from
+/proc/<pid>/stat, so the numbers are Linux-only; elsewhere only wall time is
+reported. Needs the `websockets` package.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from inventory import receipt_items  # noqa: E402
+from storage import open_repository  # noqa: E402
+
+ITEM_NAMES = ["Milk", "Eggs", "Chicken", "Spinach", "Bread", "Yogurt", "Mushrooms", "Apples", "Cheese", "Pasta"]
+
+# (page, button label) pairs to click; the first matching button is used
+INTERACTIONS = [
+    ("My List", "ℹ️ Info"),
+    ("My List", "➕ Add to Shopping List"),
+    ("My List", "🗑️ Used"),
+    ("Recommendations", "❤️ Save Favorite"),
+]
+
+
+def seed(url, count):
+    today = datetime.date.today()
+    rows = [{"Item": f"{ITEM_NAMES[i % len(ITEM_NAMES)]} {i}",
+             "Expiry Date": today + datetime.timedelta(days=i % 30)} for i in range(count)]
+    open_repository(url).save_items(receipt_items(rows, "grocery"))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def cpu_seconds(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class Client:
+    """Just enough of the browser side of the protocol to click buttons."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.widgets = []  # (kind, label, widget id, fragment id) from the last run
+
+    async def rerun(self, widget_states=(), fragment_id=""):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.fragment_id = fragment_id
+        msg.rerun_script.widget_states.widgets.extend(widget_states)
+        await self.websocket.send(msg.SerializeToString())
+        self.widgets = []
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self.websocket.recv())
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                element_type = element.WhichOneof("type")
+                proto = getattr(element, element_type)
+                if hasattr(proto, "id") and proto.id:
+                    self.widgets.append((element_type, getattr(proto, "label", ""), proto.id,
+                                         forward.delta.fragment_id))
+            elif kind == "script_finished" and forward.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return
+
+    def find(self, kind, label=""):
+        for widget in self.widgets:
+            if widget[0] == kind and widget[1].startswith(label):
+                return widget
+        raise LookupError(f"No {kind} labelled {label!r} on the page")
+
+
+def widget_state(widget_id, **value):
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    state = WidgetState(id=widget_id)
+    for field, v in value.items():
+        setattr(state, field, v)
+    return state
+
+
+async def measure(port, pid, clicks):
+    import websockets
+
+    async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"],
+                                  max_size=None) as websocket:
+        client = Client(websocket)
+        await client.rerun()
+        menu_id = client.find("component_instance")[2]
+        results = []
+        for page, label in INTERACTIONS:
+            page_state = widget_state(menu_id, json_value=f'"{page}"')
+            for scoped in (True, False):
+                cpu, wall = [], []
+                for _ in range(clicks):
+                    await client.rerun([page_state])
+                    _, _, button_id, fragment_id = client.find("button", label)
+                    cpu_start, wall_start = cpu_seconds(pid), time.perf_counter()
+                    await client.rerun([page_state, widget_state(button_id, trigger_value=True)],
+                                       fragment_id if scoped else "")
+                    wall.append((time.perf_counter() - wall_start) * 1000)
+                    if cpu_start is not None:
+                        cpu.append((cpu_seconds(pid) - cpu_start) * 1000)
+                results.append((page, label, "fragment" if scoped else "full script", cpu, wall))
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=500, help="grocery items in the seeded inventory")
+    parser.add_argument("--clicks", type=int, default=30, help="clicks per interaction and rerun scope")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        seed(url, args.items)
+        port = free_port()
+        env = dict(os.environ, SMARTEXPIRE_DATABASE_URL=url, SMARTEXPIRE_JOURNAL=os.path.join(tmp, "journal.jsonl"))
+        server = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, "smart.py"), "--server.headless=true",
+             f"--server.port={port}", "--server.fileWatcherType=none", "--browser.gatherUsageStats=false"],
+            env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+                    break
+                except OSError:
+                    if time.monotonic() > deadline or server.poll() is not None:
+                        sys.exit("Streamlit server did not start")
+                    time.sleep(0.2)
+            results = asyncio.run(measure(port, server.pid, args.clicks))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{args.items} items, {args.clicks} clicks each; medians per click\n")
+    print(f"{'page':16} {'button':26} {'rerun':12} {'server cpu':>11} {'wall':>9}")
+    for page, label, scope, cpu, wall in results:
+        cpu_text = f"{statistics.median(cpu):8.1f} ms" if cpu else "       n/a"
+        print(f"{page:16} {label:26} {scope:12} {cpu_text:>11} {statistics.median(wall):6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare OCR latency on raw uploads vs the preprocessing pipeline.
+
+Usage: python benchmarks/bench_receipt_ocr.py path/to/receipts [--no-ocr]
+
+Prints per-stage preprocessing timings for every image and the median
+end-to-end latency for raw and preprocessed OCR.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from receipts import OCR_DPI, preprocess_receipt  # noqa: E402
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+STAGES = ["decode", "downscale", "binarize", "crop", "deskew"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", help="directory of sample receipt images")
+    parser.add_argument("--no-ocr", action="store_true", help="only time preprocessing (no tesseract needed)")
+    args = parser.parse_args()
+
+    paths = sorted(os.path.join(args.corpus, name) for name in os.listdir(args.corpus)
+                   if name.lower().endswith(IMAGE_EXTENSIONS))
+    if not paths:
+        sys.exit(f"No images found in {args.corpus}")
+    if not args.no_ocr:
+        import pytesseract
+
+    raw_ms, processed_ms = [], []
+    print(f"{'image':30} {'size':>11} " + " ".join(f"{s:>9}" for s in STAGES) + f" {'raw ocr':>9} {'prep+ocr':>9}")
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        size = Image.open(io.BytesIO(data)).size
+
+        start = time.perf_counter()
+        image, timings = preprocess_receipt(data)
+        if not args.no_ocr:
+            pytesseract.image_to_string(image, config=f"--dpi {OCR_DPI}")
+        processed_ms.append((time.perf_counter() - start) * 1000)
+
+        raw = float("nan")
+        if not args.no_ocr:
+            start = time.perf_counter()
+            pytesseract.image_to_string(Image.open(io.BytesIO(data)))
+            raw = (time.perf_counter() - start) * 1000
+            raw_ms.append(raw)
+
+        print(f"{os.path.basename(path)[:30]:30} {size[0]:>5}x{size[1]:<5} "
+              + " ".join(f"{timings[s]:>9.1f}" for s in STAGES) + f" {raw:>9.1f} {processed_ms[-1]:>9.1f}")
+
+    print()
+    if raw_ms:
+        print(f"median raw OCR:          {statistics.median(raw_ms):8.1f} ms")
+    print(f"median preprocess{'' if args.no_ocr else '+OCR'}: {statistics.median(processed_ms):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Latency of fuzzy recipe search on a large synthetic catalog.
+
+Usage: python benchmarks/bench_recipe_search.py [--recipes 50000] [--queries 2000]
+
+Builds a synthetic catalog, runs a mix of exact, misspelled, prefix and
+multi-word queries through RecipeCatalog.fuzzy_search and reports latency
+percentiles. Exits non-zero if p99 exceeds the budget.
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recipes import RECIPE_TYPES, RecipeCatalog  # noqa: E402
+
+INGREDIENTS = """
+egg milk butter flour sugar salt pepper garlic onion tomato potato carrot celery chicken beef pork lamb
+turkey bacon ham sausage salmon tuna prawn rice pasta noodle bread cheese cream yogurt spinach kale lettuce
+cabbage broccoli cauliflower courgette aubergine mushroom pea bean lentil chickpea corn avocado apple banana
+orange lemon lime strawberry blueberry raspberry mango pineapple peach pear grape coconut almond walnut peanut
+cashew oat honey vanilla cinnamon ginger chilli cumin paprika turmeric basil parsley coriander thyme rosemary
+oregano mint dill chive vinegar mustard mayonnaise ketchup soy miso tofu tempeh quinoa couscous barley polenta
+parmesan mozzarella cheddar feta ricotta halloumi olive caper anchovy sardine cod haddock mackerel squid
+""".split()
+DISHES = "soup stew curry salad bake pie tart risotto stir-fry roast omelette frittata smoothie pancake wrap sandwich".split()
+
+
+def synthetic_catalog(size, rng):
+    recipes = []
+    for i in range(size):
+        ingredients = rng.sample(INGREDIENTS, rng.randint(3, 9))
+        name = f"{ingredients[0].title()} {rng.choice(DISHES).title()} {i}"
+        recipes.append({"name": name, "type": rng.choice(RECIPE_TYPES), "description": "",
+                        "ingredients": ", ".join(ingredients), "time": "", "instructions": "", "image": ""})
+    return recipes
+
+
+def misspell(word, rng):
+    i = rng.randrange(len(word))
+    edit = rng.choice(["drop", "swap", "replace"])
+    if edit == "drop" and len(word) > 3:
+        return word[:i] + word[i + 1:]
+    if edit == "swap" and i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+
+
+def synthetic_queries(count, rng):
+    queries = []
+    for _ in range(count):
+        word = rng.choice(INGREDIENTS)
+        kind = rng.choice(["exact", "plural", "typo", "prefix", "multi"])
+        if kind == "plural":
+            queries.append(f" {word.title()}s ")
+        elif kind == "typo":
+            queries.append(misspell(word, rng))
+        elif kind == "prefix":
+            queries.append(word[:max(2, len(word) // 2)])
+        elif kind == "multi":
+            queries.append(f"{word} {misspell(rng.choice(INGREDIENTS), rng)}")
+        else:
+            queries.append(word)
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--budget-ms", type=float, default=10.0, help="p99 latency budget")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    catalog = RecipeCatalog(synthetic_catalog(args.recipes, rng))
+    print(f"built {len(catalog)} recipes / {len(catalog.terms)} terms in {time.perf_counter() - start:.2f}s")
+
+    queries = synthetic_queries(args.queries, rng)
+    for query in queries[:50]:  # warm up
+        catalog.fuzzy_search(query)
+    latencies, empty = [], 0
+    for query in queries:
+        start = time.perf_counter()
+        results = catalog.fuzzy_search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        empty += not results
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]  # noqa: E731
+    print(f"queries: {len(latencies)}  no results: {empty}")
+    print(f"mean {statistics.mean(latencies):.2f} ms  p50 {p(0.50):.2f} ms  p95 {p(0.95):.2f} ms  "
+          f"p99 {p(0.99):.2f} ms  max {latencies[-1]:.2f} ms")
+    if p(0.99) > args.budget_ms:
+        sys.exit(f"p99 {p(0.99):.2f} ms is over the {args.budget_ms} ms budget")
+
+
+if __name__ == "__main__":
+    main()
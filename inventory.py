@@ -0,0 +1,403 @@
+import datetime
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from analytics import ConsumptionStats
+from reorder import ConsumptionRates
+
+COLUMNS = [
+    "Item", "Category", "Quantity", "Purchase Date", "Expiry Date",
+    "Opened", "Calories", "Storage", "Notes", "Type", "Best Before", "Use By", "Best Stored"
+]
+
+MODES = ["grocery", "pharmacy", "cosmetics", "cleaning", "pet_care"]
+DATE_COLUMNS = ["Purchase Date", "Expiry Date", "Best Before", "Use By"]
+USED_COLUMNS = ["Item", "Category", "Quantity", "Used On", "Used In", "Notes", "Type"]
+
+# Category choices per mode, shared by the add-item form and receipt import
+CATEGORIES = {
+    "grocery": ["Dairy", "Meat", "Vegetable", "Fruit", "Bakery", "Other"],
+    "pharmacy": ["Pain Relief", "Antibiotic", "Supplements", "Allergy", "Other"],
+    "cosmetics": ["Skincare", "Haircare", "Makeup", "Other"],
+    "cleaning": ["Kitchen", "Bathroom", "Laundry", "Other"],
+    "pet_care": ["Pet Food", "Pet Supplies", "Other"]
+}
+
+CATEGORY_KEYWORDS = {
+    "grocery": {
+        "Dairy": ["milk", "cheese", "yogurt", "yoghurt", "butter", "cream", "egg", "cheddar", "mozzarella", "kefir"],
+        "Meat": ["chicken", "beef", "pork", "lamb", "turkey", "bacon", "ham", "sausage", "mince", "steak", "fish",
+                 "salmon", "tuna", "prawn", "shrimp"],
+        "Vegetable": ["carrot", "potato", "onion", "tomato", "lettuce", "spinach", "broccoli", "pepper", "cucumber",
+                      "mushroom", "garlic", "cabbage", "courgette", "zucchini", "celery", "kale", "bean", "pea"],
+        "Fruit": ["apple", "banana", "orange", "grape", "berry", "strawberry", "blueberry", "lemon", "lime", "pear",
+                  "peach", "mango", "melon", "kiwi", "avocado", "pineapple"],
+        "Bakery": ["bread", "bagel", "roll", "bun", "croissant", "muffin", "loaf", "baguette", "cake", "wrap", "pita"],
+    },
+    "pharmacy": {
+        "Pain Relief": ["ibuprofen", "paracetamol", "acetaminophen", "aspirin", "naproxen", "pain"],
+        "Antibiotic": ["amoxicillin", "penicillin", "antibiotic", "doxycycline"],
+        "Supplements": ["vitamin", "supplement", "omega", "zinc", "iron", "magnesium", "probiotic"],
+        "Allergy": ["antihistamine", "cetirizine", "loratadine", "allergy", "hayfever"],
+    },
+    "cosmetics": {
+        "Skincare": ["moisturizer", "moisturiser", "cleanser", "serum", "sunscreen", "lotion", "toner"],
+        "Haircare": ["shampoo", "conditioner", "hair", "gel", "mousse"],
+        "Makeup": ["mascara", "lipstick", "foundation", "eyeliner", "blush", "concealer", "powder"],
+    },
+    "cleaning": {
+        "Kitchen": ["dish", "dishwasher", "sponge", "degreaser", "kitchen"],
+        "Bathroom": ["toilet", "bleach", "bathroom", "tile", "limescale"],
+        "Laundry": ["laundry", "detergent", "softener", "stain", "washing"],
+    },
+    "pet_care": {
+        "Pet Food": ["food", "kibble", "treat", "biscuit", "chew"],
+        "Pet Supplies": ["litter", "toy", "leash", "lead", "collar", "shampoo", "bowl"],
+    },
+}
+
+ALL_CATEGORIES = list(dict.fromkeys(c for categories in CATEGORIES.values() for c in categories))
+
+_KEYWORD_INDEX = {
+    mode: {keyword: category for category, keywords in groups.items() for keyword in keywords}
+    for mode, groups in CATEGORY_KEYWORDS.items()
+}
+
+# Default shelf life for items that arrive without an expiry date
+SHELF_LIFE_DAYS = {"Dairy": 7, "Meat": 3, "Vegetable": 7, "Fruit": 7, "Bakery": 4}
+DEFAULT_SHELF_LIFE_DAYS = {"grocery": 14, "pharmacy": 365, "cosmetics": 365, "cleaning": 720, "pet_care": 180}
+
+
+# Random (version 4) UUIDs as hex, generated in one batch for bulk imports
+def new_item_ids(count):
+    raw = np.frombuffer(os.urandom(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+    raw[:, 6] = raw[:, 6] & 0x0F | 0x40
+    raw[:, 8] = raw[:, 8] & 0x3F | 0x80
+    digits = raw.tobytes().hex()
+    return [digits[i:i + 32] for i in range(0, 32 * count, 32)]
+
+
+def _categorical(values, categories):
+    extra = sorted(set(values.dropna()) - set(categories))
+    return pd.Categorical(values, categories=list(categories) + extra)
+
+
+def _dates(values):
+    return pd.to_datetime(values).astype("datetime64[ns]")
+
+
+def _common_columns(df):
+    return {
+        "Category": _categorical(df["Category"], ALL_CATEGORIES),
+        "Quantity": pd.to_numeric(df["Quantity"]).astype("Int32").array,
+        "Type": pd.Categorical(df["Type"], categories=MODES),
+    }
+
+
+# Inventory frames are indexed by a stable item ID rather than row position,
+# with datetime64 dates and categorical Type/Category so filters and date
+# arithmetic stay vectorized.
+def typed_inventory(df=None):
+    if df is None:
+        df = pd.DataFrame(columns=COLUMNS)
+    df = df.reindex(columns=COLUMNS)
+    ids = df.index if df.index.name == "ID" else pd.Index(new_item_ids(len(df)), name="ID")
+    typed = pd.DataFrame({
+        "Item": df["Item"].to_numpy(),
+        "Purchase Date": _dates(df["Purchase Date"]).to_numpy(),
+        "Expiry Date": _dates(df["Expiry Date"]).to_numpy(),
+        "Opened": df["Opened"].fillna(False).astype(bool).to_numpy(),
+        "Calories": pd.to_numeric(df["Calories"]).fillna(0).astype("Int32").to_numpy(),
+        "Storage": df["Storage"].to_numpy(),
+        "Notes": df["Notes"].to_numpy(),
+        "Best Before": _dates(df["Best Before"]).to_numpy(),
+        "Use By": _dates(df["Use By"]).to_numpy(),
+        "Best Stored": df["Best Stored"].to_numpy(),
+    }, index=ids)
+    return typed.assign(**_common_columns(df))[COLUMNS]
+
+
+def typed_used_items(df=None):
+    if df is None:
+        df = pd.DataFrame(columns=USED_COLUMNS)
+    df = df.reindex(columns=USED_COLUMNS).reset_index(drop=True)
+    typed = df.assign(**_common_columns(df))
+    typed["Used On"] = _dates(df["Used On"])
+    return typed[USED_COLUMNS]
+
+
+def match_category(name, mode):
+    keywords = _KEYWORD_INDEX.get(mode, {})
+    for token in re.findall(r"[a-z]+", name.lower()):
+        category = keywords.get(token) or (keywords.get(token[:-1]) if token.endswith("s") else None)
+        if category:
+            return category
+    return "Other"
+
+
+def receipt_items(rows, mode, today=None):
+    rows = list(rows)
+    today = today or datetime.date.today()
+    categories = [row.get("Category") or match_category(row["Item"], mode) for row in rows]
+    expiry = [
+        pd.Timestamp(row["Expiry Date"]).date() if pd.notna(row.get("Expiry Date"))
+        else today + datetime.timedelta(days=SHELF_LIFE_DAYS.get(category, DEFAULT_SHELF_LIFE_DAYS.get(mode, 14)))
+        for row, category in zip(rows, categories)
+    ]
+    return typed_inventory(pd.DataFrame({
+        "Item": [row["Item"] for row in rows],
+        "Category": categories,
+        "Quantity": [int(row.get("Quantity") or 1) for row in rows],
+        "Purchase Date": [today] * len(rows),
+        "Expiry Date": expiry,
+        "Opened": [False] * len(rows),
+        "Calories": [0] * len(rows),
+        "Storage": [""] * len(rows),
+        "Notes": ["Added from receipt"] * len(rows),
+        "Type": [mode] * len(rows),
+        "Best Before": expiry,
+        "Use By": expiry,
+        "Best Stored": [""] * len(rows),
+    }, columns=COLUMNS))
+
+
+# One concat for the whole batch instead of one per item
+def concat_items(frames):
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return typed_inventory()
+    if len(frames) == 1:
+        return frames[0]
+    combined = pd.concat(frames)
+    if not isinstance(combined["Category"].dtype, pd.CategoricalDtype):
+        combined["Category"] = _categorical(combined["Category"], ALL_CATEGORIES)
+    return combined
+
+
+# Urgency bands per mode as (soon, moderate) days left: items expiring
+# within `soon` days (or already expired) are "soon", then up to `moderate`
+# days "moderate", and anything later "fine". Shared by the Home stats and
+# the item list's card styles.
+URGENCY_THRESHOLDS = {
+    "grocery": (3, 7),
+    "pharmacy": (7, 30),
+    "cosmetics": (7, 30),
+    "cleaning": (7, 30),
+    "pet_care": (7, 30),
+}
+URGENCY_CLASSES = ["expiring-soon", "expiring-moderate", "expiring-fine"]
+
+
+# Items without an expiry date (<NA> days left) never expire, so are "fine"
+def urgency_classes(days_left, mode):
+    soon, moderate = URGENCY_THRESHOLDS[mode]
+    days_left = pd.array(days_left, dtype="Float64").to_numpy(dtype="float64", na_value=np.inf)
+    return np.select([days_left <= soon, days_left <= moderate], URGENCY_CLASSES[:2], URGENCY_CLASSES[2])
+
+
+# Card fields for a slice of a partition in one vectorized pass: days left,
+# urgency class and the dates as display strings ("No expiry" / "Not set"
+# where a date is missing).
+def card_fields(df, days_left, mode):
+    return df.assign(**{
+        "Days Until Expiry": days_left,
+        "Urgency": urgency_classes(days_left, mode),
+        "Expiry Text": df["Expiry Date"].dt.strftime("%Y-%m-%d").fillna("No expiry"),
+        "Best Before Text": df["Best Before"].dt.strftime("%Y-%m-%d").fillna("Not set"),
+        "Use By Text": df["Use By"].dt.strftime("%Y-%m-%d").fillna("Not set"),
+    })
+
+
+def _today(today=None):
+    return np.datetime64(today or datetime.date.today(), "D")
+
+
+class ExpiryIndex:
+    """Item IDs of one partition sorted by expiry date.
+
+    Dates are stored absolutely, so a day rolling over needs no rebuild;
+    "expiring within N days" is a binary search against today + N. Items
+    without an expiry date come last and are left out of the counts.
+    """
+
+    def __init__(self, df):
+        dates = df["Expiry Date"].to_numpy().astype("datetime64[D]")
+        order = np.argsort(dates, kind="stable")  # NaT sorts last
+        self.dates = dates[order]
+        self.ids = df.index.to_numpy()[order]
+        self.dated = len(self.dates) - int(np.count_nonzero(np.isnat(self.dates)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _position(self, days, today=None):
+        return int(np.searchsorted(self.dates[:self.dated], _today(today) + days, side="right"))
+
+    def count_within(self, days, today=None):
+        return self._position(days, today)
+
+    def count_between(self, after_days, within_days, today=None):
+        return max(0, self._position(within_days, today) - self._position(after_days, today))
+
+    def ids_within(self, days, today=None):
+        return self.ids[:self._position(days, today)]
+
+    # Nullable ints: <NA> for items without an expiry date
+    def days_left(self, today=None, start=0, stop=None):
+        dates = self.dates[start:stop]
+        return pd.arrays.IntegerArray((dates - _today(today)).astype("int64"), np.isnat(dates))
+
+    # Items per urgency band, by binary search on the same thresholds
+    # urgency_classes applies row by row
+    def urgency_counts(self, mode, today=None):
+        soon, moderate = URGENCY_THRESHOLDS[mode]
+        return {URGENCY_CLASSES[0]: self.count_within(soon, today),
+                URGENCY_CLASSES[1]: self.count_between(soon, moderate, today),
+                URGENCY_CLASSES[2]: self.dated - self.count_within(moderate, today)}
+
+
+class Inventory:
+    """Typed inventory kept as one partition per mode.
+
+    Pages read their mode's partition as-is (no filtering, no copy), and
+    adds/removals only touch the partitions they affect. Partitions are
+    shared with callers, so treat them as read-only.
+
+    Adds and removals are O(1): new rows are queued and removed IDs are
+    tombstoned, and both are folded into the partition in a single pass the
+    next time it is read, however many changes a rerun made.
+
+    With a loader (mode -> typed frame), each partition is fetched the first
+    time it is read, so a session only holds the modes it has visited.
+    """
+
+    def __init__(self, items=None, loader=None):
+        self._loader = loader
+        self._unloaded = set(MODES) if loader else set()
+        self._partitions = {mode: typed_inventory() for mode in MODES}
+        self._pending = {mode: [] for mode in MODES}
+        self._tombstones = {mode: set() for mode in MODES}
+        self.versions = dict.fromkeys(MODES, 0)
+        self._expiry_indexes = {}
+        if items is not None:
+            self.add(items)
+
+    def _compact(self, mode):
+        if mode in self._unloaded:
+            self._unloaded.discard(mode)
+            self._partitions[mode] = self._loader(mode)
+        pending, tombstones = self._pending[mode], self._tombstones[mode]
+        if pending:
+            self._partitions[mode] = concat_items([self._partitions[mode]] + pending)
+            pending.clear()
+        if tombstones:
+            self._partitions[mode] = self._partitions[mode].drop(list(tombstones), errors="ignore")
+            tombstones.clear()
+        return self._partitions[mode]
+
+    def items(self, mode):
+        return self._compact(mode)
+
+    def add(self, new_items):
+        for mode, group in new_items.groupby("Type", observed=True, sort=False):
+            # Load stored rows first; once the new ones are saved the loader
+            # would return them too
+            if mode in self._unloaded:
+                self._compact(mode)
+            self._pending[mode].append(group)
+            self.versions[mode] += 1
+
+    def remove(self, mode, ids):
+        self._tombstones[mode].update(ids)
+        self.versions[mode] += 1
+
+    def expiry_index(self, mode):
+        version, index = self._expiry_indexes.get(mode, (None, None))
+        if version != self.versions[mode]:
+            index = ExpiryIndex(self._compact(mode))
+            self._expiry_indexes[mode] = (self.versions[mode], index)
+        return index
+
+
+class UsedItemsLog:
+    """Append-only history of used items.
+
+    Records are buffered as plain dicts and folded into the typed frame the
+    next time it is read, so marking items used never copies the history.
+    A loader, if given, supplies the stored history on first read.
+
+    Everything added is also counted in `stats` and `rates`; records may
+    carry the item's "Expiry Date" and receipt "Price" for the waste and
+    savings figures, though only the used-items columns are kept.
+    """
+
+    def __init__(self, items=None, loader=None):
+        self._frame = typed_used_items(items)
+        self._pending = []
+        self._frames = []
+        self._loader = loader
+        self._stats = ConsumptionStats()
+        self._rates = ConsumptionRates()
+        self._trackers = (self._stats, self._rates)
+        self._track_frame(self._frame)
+
+    def _track_frame(self, frame):
+        for tracker in self._trackers:
+            tracker.record_frame(frame)
+
+    def _load(self):
+        if self._loader is not None:
+            stored, self._loader = self._loader(), None
+            self._track_frame(stored)
+            if len(stored):
+                self._frame = pd.concat([stored, self._frame], ignore_index=True) if len(self._frame) else stored
+
+    @property
+    def stats(self):
+        self._load()
+        return self._stats
+
+    @property
+    def rates(self):
+        self._load()
+        return self._rates
+
+    @property
+    def empty(self):
+        self._load()
+        return self._frame.empty and not self._pending and not self._frames
+
+    def __len__(self):
+        self._load()
+        return len(self._frame) + len(self._pending) + sum(len(df) for df in self._frames)
+
+    # Stored history is loaded before anything is added, as for Inventory
+    def append(self, records):
+        self._load()
+        for tracker in self._trackers:
+            tracker.record_many(records)
+        self._pending.extend(records)
+
+    # Typed frames, e.g. bulk-imported chunks
+    def extend(self, frame):
+        self._load()
+        self._track_frame(frame)
+        self._fold_pending()
+        self._frames.append(frame)
+
+    def _fold_pending(self):
+        if self._pending:
+            self._frames.append(typed_used_items(pd.DataFrame(self._pending, columns=USED_COLUMNS)))
+            self._pending = []
+
+    def frame(self):
+        self._load()
+        self._fold_pending()
+        if self._frames:
+            frames = [self._frame] + self._frames if len(self._frame) else self._frames
+            self._frame = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            self._frames = []
+        return self._frame
@@ -0,0 +1,186 @@
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+import pandas as pd
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Instrumentation is off unless SMARTEXPIRE_PROFILE is set for the whole
+# server, or a session opens the app with ?profile=1.
+PROFILE_ENV = os.environ.get("SMARTEXPIRE_PROFILE", "").lower() not in ("", "0", "false", "no")
+PROFILE_LOG = os.environ.get(
+    "SMARTEXPIRE_PROFILE_LOG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".profile.jsonl"),
+)
+# Per-metric samples kept for the debug panel's histograms
+PROFILE_SAMPLES = 500
+
+# Per-run metrics that aren't timers
+RUN_METRICS = ["run_ms", "widgets", "messages", "payload_bytes"]
+
+
+def profiling_requested(query_params):
+    return PROFILE_ENV or query_params.get("profile") == "1"
+
+
+class RerunProfiler:
+    """Timings, widget counts and payload sizes for each script run.
+
+    Shared by every profiled session on the server. A full run is bracketed
+    by `start_run` and `finish_run`; a fragment rerun skips the top and
+    bottom of the script, so the first timer it enters opens a run and
+    closes it again on exit. Finished runs go to the rolling samples shown
+    on the debug panel and, one JSON object per line, to the log file.
+    """
+
+    def __init__(self, log_path=PROFILE_LOG, samples=PROFILE_SAMPLES):
+        self.log_path = log_path
+        self._samples = defaultdict(lambda: deque(maxlen=samples))
+        self._runs = {}  # session ID -> open run
+        self._lock = threading.Lock()
+
+    # The open run of the current script run, or None. Streamlit gives every
+    # run (full or fragment) a fresh cursor map, which tells a run left open
+    # by an interrupted script (st.rerun, an exception) from the current one.
+    def _current(self, ctx):
+        run = self._runs.get(ctx.session_id)
+        if run is not None and run["cursors"] is ctx.cursors:
+            return run
+        return None
+
+    def _open(self, ctx, scope):
+        self._count_payload(ctx)
+        run = {"cursors": ctx.cursors, "scope": scope, "start": time.perf_counter(),
+               "timings": defaultdict(float), "calls": defaultdict(int), "messages": 0, "payload_bytes": 0}
+        self._runs[ctx.session_id] = run
+        return run
+
+    # Sizes of the messages this session sends; wraps the context's enqueue
+    # function once, since the context lives as long as the script thread.
+    def _count_payload(self, ctx):
+        if getattr(ctx, "_profiled_enqueue", False):
+            return
+        enqueue = ctx._enqueue
+
+        def counting_enqueue(msg):
+            run = self._current(ctx)
+            if run is not None:
+                run["messages"] += 1
+                run["payload_bytes"] += msg.ByteSize()
+            enqueue(msg)
+
+        ctx._enqueue = counting_enqueue
+        ctx._profiled_enqueue = True
+
+    def start_run(self):
+        ctx = get_script_run_ctx()
+        if ctx is not None:
+            self._open(ctx, "script")
+
+    def finish_run(self, **fields):
+        ctx = get_script_run_ctx()
+        run = self._current(ctx) if ctx is not None else None
+        if run is None:
+            return
+        del self._runs[ctx.session_id]
+        try:
+            widgets = len(ctx.shared.widget_ids_this_run.snapshot())
+        except AttributeError:
+            widgets = None
+        record = {
+            "time": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "session": ctx.session_id,
+            "scope": run["scope"],
+            **fields,
+            "run_ms": round((time.perf_counter() - run["start"]) * 1000, 3),
+            "widgets": widgets,
+            "messages": run["messages"],
+            "payload_bytes": run["payload_bytes"],
+            "timings": {name: round(ms, 3) for name, ms in run["timings"].items()},
+            "calls": dict(run["calls"]),
+        }
+        with self._lock:
+            for metric in RUN_METRICS:
+                if record[metric] is not None:
+                    self._samples[metric].append(record[metric])
+            for name, ms in record["timings"].items():
+                self._samples[name].append(ms)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    @contextmanager
+    def timer(self, name):
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            yield
+            return
+        run = self._current(ctx)
+        owner = run is None
+        if owner:
+            run = self._open(ctx, name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            run["timings"][name] += (time.perf_counter() - start) * 1000
+            run["calls"][name] += 1
+            if owner:
+                self.finish_run()
+
+    def timed(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def metrics(self):
+        with self._lock:
+            return sorted(self._samples)
+
+    def summary(self):
+        with self._lock:
+            samples = {name: np.array(values, dtype=float) for name, values in self._samples.items()}
+        return pd.DataFrame(
+            [{"metric": name, "runs": len(values), "p50": np.median(values),
+              "p95": np.percentile(values, 95), "max": values.max()}
+             for name, values in sorted(samples.items())],
+            columns=["metric", "runs", "p50", "p95", "max"],
+        ).set_index("metric")
+
+    def histogram(self, metric, bins=10):
+        with self._lock:
+            values = np.array(self._samples.get(metric, ()), dtype=float)
+        if not len(values):
+            return pd.Series(dtype=int)
+        counts, edges = np.histogram(values, bins=bins)
+        # Indexed by each bin's lower edge
+        return pd.Series(counts, index=pd.Index(edges[:-1].round(3), name=metric), name="runs")
+
+
+class _NotProfiling:
+    """Stands in for RerunProfiler in sessions that aren't profiled."""
+
+    def start_run(self):
+        pass
+
+    def finish_run(self, **fields):
+        pass
+
+    def timer(self, name):
+        return nullcontext()
+
+    def timed(self, name):
+        return lambda func: func
+
+
+NOT_PROFILING = _NotProfiling()
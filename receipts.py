@@ -0,0 +1,459 @@
+import atexit
+import datetime
+import hashlib
+import io
+import math
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import ExifTags, Image, ImageOps, ImageStat
+
+# OCR results are cached by content hash so a receipt is only read once,
+# no matter how many reruns or sessions see the same upload.
+OCR_CACHE_DIR = os.environ.get(
+    "SMARTEXPIRE_OCR_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ocr_cache"),
+)
+OCR_CACHE_MEMORY_ENTRIES = 128
+OCR_CACHE_DISK_ENTRIES = 2048
+OCR_WORKERS = int(os.environ.get("SMARTEXPIRE_OCR_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# Failed jobs are remembered for a while, so reruns show the error instead
+# of resubmitting the same bad image; after that the receipt can be retried.
+OCR_FAILURE_ENTRIES = 64
+OCR_FAILURE_TTL = 300
+
+# Originals are written once per digest; sessions only hold a thumbnail.
+RECEIPT_STORE_DIR = os.environ.get(
+    "SMARTEXPIRE_RECEIPT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".receipts"),
+)
+THUMBNAIL_SIZE = (240, 240)
+
+# Receipts are ~80mm wide, so ~1000px keeps text near tesseract's preferred 300 DPI
+OCR_MAX_WIDTH = 1000
+# The paper is located on a copy that fits in this box
+OCR_PREVIEW_SIZE = (400, 400)
+OCR_DPI = 300
+DESKEW_MAX_ANGLE = 5
+
+
+def receipt_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@contextmanager
+def _stage(timings, name):
+    start = time.perf_counter()
+    yield
+    timings[name] = timings.get(name, 0) + (time.perf_counter() - start) * 1000
+
+
+def _otsu_threshold(histogram):
+    total = sum(histogram)
+    weighted_total = sum(i * count for i, count in enumerate(histogram))
+    background = background_sum = 0
+    best_threshold, best_variance = 127, -1.0
+    for i, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        background_sum += i * count
+        mean_background = background_sum / background
+        mean_foreground = (weighted_total - background_sum) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = i, variance
+    return best_threshold
+
+
+# Straight text lines give the most uneven row profile, so pick the angle
+# whose row means vary the most. Only the middle of the page is scored so
+# paper edges and background don't dominate, on a small copy to stay cheap.
+def _estimate_skew(image, max_angle=DESKEW_MAX_ANGLE):
+    width, height = image.size
+    small = image.crop((width // 5, height // 5, width - width // 5, height - height // 5))
+    small.thumbnail((300, 1200))
+
+    def score(angle):
+        rotated = small.rotate(angle, fillcolor=255) if angle else small
+        return ImageStat.Stat(rotated.resize((1, rotated.height), Image.BOX)).var[0]
+
+    # Only an angle that's strictly better than none turns the image, so a
+    # blank or low-contrast one is left as it is
+    best_angle, best_score = 0, score(0)
+    for angle in (step / 2 for step in range(-2 * max_angle, 2 * max_angle + 1)):
+        if angle:
+            angle_score = score(angle)
+            if angle_score > best_score:
+                best_angle, best_score = angle, angle_score
+    return best_angle
+
+
+# Stored JPEG pixels are a quarter turn from upright for EXIF orientations 5-8
+def _open_upright(data, size=None):
+    """Decodes a photo to upright grayscale. A JPEG is decoded at the
+    smallest 1/2, 1/4 or 1/8 scale that still covers `size` (upright)."""
+    image = Image.open(io.BytesIO(data))
+    if size is not None and image.format == "JPEG":
+        if image.getexif().get(ExifTags.Base.Orientation, 1) > 4:
+            size = size[::-1]
+        image.draft("L", size)
+    return ImageOps.exif_transpose(image).convert("L")
+
+
+def _binarize(image):
+    image = ImageOps.autocontrast(image)
+    threshold = _otsu_threshold(image.histogram())
+    return image.point([0 if i <= threshold else 255 for i in range(256)])
+
+
+# After thresholding the paper is the white region; its box on the preview
+# as fractions of the preview size, or None if nothing is white
+def _paper_box(preview):
+    bbox = _binarize(preview).getbbox()
+    if not bbox:
+        return None
+    width, height = preview.size
+    # One preview pixel of margin so rounding never clips the paper
+    left, top = max(bbox[0] - 1, 0), max(bbox[1] - 1, 0)
+    right, bottom = min(bbox[2] + 1, width), min(bbox[3] + 1, height)
+    return left / width, top / height, right / width, bottom / height
+
+
+def preprocess_receipt(data, max_width=OCR_MAX_WIDTH):
+    """Decode, crop, downscale, binarize and deskew a receipt photo for OCR.
+
+    The paper is found on a small preview, cropped from the photo at full
+    resolution and only then scaled to `max_width`, so a receipt that fills
+    a third of the frame still gets the whole width. A JPEG is decoded at
+    the smallest scale that keeps the cropped receipt at least that wide.
+
+    Returns the processed image and the time spent in each stage in ms.
+    """
+    timings = {}
+    with _stage(timings, "decode"):
+        preview = _open_upright(data, OCR_PREVIEW_SIZE)
+        preview.thumbnail(OCR_PREVIEW_SIZE)
+    with _stage(timings, "crop"):
+        box = _paper_box(preview) or (0, 0, 1, 1)
+    with _stage(timings, "decode"):
+        width = math.ceil(max_width / (box[2] - box[0]))
+        image = _open_upright(data, (width, math.ceil(width * preview.height / preview.width)))
+    with _stage(timings, "crop"):
+        width, height = image.size
+        box = (round(box[0] * width), round(box[1] * height), round(box[2] * width), round(box[3] * height))
+        if box != (0, 0, width, height):
+            image = image.crop(box)
+    with _stage(timings, "downscale"):
+        if image.width > max_width:
+            image = image.resize((max_width, max(1, image.height * max_width // image.width)), Image.LANCZOS)
+    with _stage(timings, "binarize"):
+        image = _binarize(image)
+    with _stage(timings, "deskew"):
+        angle = _estimate_skew(image)
+        if angle:
+            image = image.rotate(angle, expand=True, fillcolor=255)
+    return image, timings
+
+
+# Runs inside a worker process, so it has to live at module level
+def run_ocr(data):
+    import pytesseract
+
+    image, _ = preprocess_receipt(data)
+    return pytesseract.image_to_string(image, config=f"--dpi {OCR_DPI}")
+
+
+class OcrCache:
+    """Bounded LRU of OCR text in memory, backed by one file per digest on disk."""
+
+    def __init__(self, directory=OCR_CACHE_DIR, memory_entries=OCR_CACHE_MEMORY_ENTRIES,
+                 disk_entries=OCR_CACHE_DISK_ENTRIES):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, digest):
+        return os.path.join(self.directory, f"{digest}.txt")
+
+    def _remember(self, digest, text):
+        with self._lock:
+            self._memory[digest] = text
+            self._memory.move_to_end(digest)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, digest):
+        with self._lock:
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+                return self._memory[digest]
+        if not self.directory:
+            return None
+        path = self._path(digest)
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path)  # recently read entries survive pruning
+        except OSError:
+            return None
+        self._remember(digest, text)
+        return text
+
+    def put(self, digest, text):
+        self._remember(digest, text)
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(digest)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        self._prune_disk()
+
+    def _prune_disk(self):
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith(".txt")]
+        if len(entries) <= self.disk_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.disk_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class OcrService:
+    """Runs OCR jobs on a process pool, one job per distinct receipt.
+
+    Shared by every session on the server; `submit` never blocks, and
+    `result` returns None while the job is still running and raises the
+    job's error if it failed recently. A pool broken by a dead worker is
+    replaced on the next submit.
+    """
+
+    def __init__(self, cache=None, workers=OCR_WORKERS, ocr=run_ocr, failure_ttl=OCR_FAILURE_TTL):
+        self.cache = cache if cache is not None else OcrCache()
+        self._ocr = ocr
+        self._workers = workers
+        self._executor = self._new_executor()
+        self._pending = {}
+        self._failures = OrderedDict()  # digest -> (time failed, exception)
+        self._failure_ttl = failure_ttl
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def _new_executor(self):
+        if self._workers <= 0:
+            return None
+        return ProcessPoolExecutor(max_workers=self._workers, mp_context=multiprocessing.get_context("spawn"))
+
+    # Called with the lock held
+    def _failure(self, digest):
+        failure = self._failures.get(digest)
+        if failure is not None and time.monotonic() - failure[0] > self._failure_ttl:
+            del self._failures[digest]
+            return None
+        return failure
+
+    def submit(self, data, digest=None):
+        digest = digest or receipt_digest(data)
+        if self.cache.get(digest) is not None:
+            return digest
+        with self._lock:
+            if digest in self._pending or self._failure(digest) is not None:
+                return digest
+            if self._executor is None:
+                future = Future()
+                try:
+                    future.set_result(self._ocr(data))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                try:
+                    future = self._executor.submit(self._ocr, data)
+                except BrokenProcessPool:
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._new_executor()
+                    future = self._executor.submit(self._ocr, data)
+            self._pending[digest] = future
+        future.add_done_callback(lambda f: self._finish(digest, f))
+        return digest
+
+    def _finish(self, digest, future):
+        error = None if future.cancelled() else future.exception()
+        if error is None and not future.cancelled():
+            self.cache.put(digest, future.result())
+        with self._lock:
+            self._pending.pop(digest, None)
+            if error is not None:
+                self._failures[digest] = (time.monotonic(), error)
+                if len(self._failures) > OCR_FAILURE_ENTRIES:
+                    self._failures.popitem(last=False)
+
+    def result(self, digest, timeout=0):
+        text = self.cache.get(digest)
+        if text is not None:
+            return text
+        with self._lock:
+            future = self._pending.get(digest)
+            failure = self._failure(digest) if future is None else None
+        if failure is not None:
+            raise failure[1]
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            return None
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def make_thumbnail(data, size=THUMBNAIL_SIZE):
+    image = Image.open(io.BytesIO(data))
+    image.draft("RGB", size)
+    image = image.convert("RGB")
+    image.thumbnail(size)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=70)
+    return buffer.getvalue()
+
+
+def store_original(data, digest, extension="", directory=RECEIPT_STORE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{digest}{extension}")
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return path
+
+
+class ReceiptLog:
+    """Per-session receipt history keyed by content digest.
+
+    Re-ingesting the same upload is a no-op, so reruns with a file still in
+    the uploader don't grow the log. Entries hold a small thumbnail and the
+    path of the original rather than the raw upload.
+
+    Stored receipts (dicts with date and original path, oldest first) can be
+    passed in; their thumbnails are made from the originals when first shown.
+    """
+
+    def __init__(self, directory=RECEIPT_STORE_DIR, stored=()):
+        self.directory = directory
+        self._entries = {}
+        self._order = []
+        for row in stored:
+            digest = os.path.splitext(os.path.basename(row["original"]))[0]
+            self._entries[digest] = {
+                "number": len(self._order) + 1, "digest": digest, "date": row["date"], "text": None,
+                "items": None, "imported": True, "thumbnail": None, "original": row["original"],
+            }
+            self._order.append(digest)
+
+    def __contains__(self, digest):
+        return digest in self._entries
+
+    def __len__(self):
+        return len(self._order)
+
+    def get(self, digest):
+        return self._entries.get(digest)
+
+    def ingest(self, data, digest=None, name="", date=None):
+        digest = digest or receipt_digest(data)
+        entry = self._entries.get(digest)
+        if entry is not None:
+            return entry, False
+        entry = {
+            "number": len(self._order) + 1,
+            "digest": digest,
+            "date": date or datetime.date.today(),
+            "text": None,
+            "items": None,
+            "imported": False,
+            "thumbnail": make_thumbnail(data),
+            "original": store_original(data, digest, os.path.splitext(name)[1].lower(), self.directory),
+        }
+        self._entries[digest] = entry
+        self._order.append(digest)
+        return entry, True
+
+    def set_text(self, digest, text):
+        entry = self._entries[digest]
+        if entry["text"] == text:
+            return False
+        entry["text"] = text
+        return True
+
+    def page_count(self, per_page):
+        return max(1, -(-len(self._order) // per_page))
+
+    # Newest first; only the requested slice is touched
+    def page(self, number, per_page):
+        end = len(self._order) - number * per_page
+        start = max(0, end - per_page)
+        entries = [self._entries[d] for d in reversed(self._order[start:max(0, end)])]
+        for entry in entries:
+            if entry["thumbnail"] is None and os.path.exists(entry["original"]):
+                with open(entry["original"], "rb") as f:
+                    entry["thumbnail"] = make_thumbnail(f.read())
+        return entries
+
+
+# Receipt line parsing
+PRICE_RE = re.compile(r"(-?\d+[.,]\d{2})\s*[A-Z*]?\s*$")
+LEADING_QUANTITY_RE = re.compile(r"^\s*(\d{1,3})\s*(?:x|@|\*)?\s+(?=[A-Za-z])", re.IGNORECASE)
+UNIT_PRICE_RE = re.compile(r"\s(\d{1,3})\s*(?:x|@)\s*\d+[.,]\d{2}\s*$", re.IGNORECASE)
+NON_ITEM_RE = re.compile(
+    r"\b(sub\s*total|total|tax|vat|change|cash|card|visa|mastercard|balance|amount|due|discount|savings|"
+    r"tender|payment|refund|points)\b",
+    re.IGNORECASE,
+)
+
+
+def parse_receipt_line(line):
+    line = line.strip()
+    match = PRICE_RE.search(line)
+    if not match or NON_ITEM_RE.search(line):
+        return None
+    price = float(match.group(1).replace(",", "."))
+    name = line[:match.start()]
+    quantity = 1
+    unit_price = UNIT_PRICE_RE.search(name)
+    if unit_price:
+        quantity = int(unit_price.group(1))
+        name = name[:unit_price.start()]
+    leading = LEADING_QUANTITY_RE.match(name)
+    if leading:
+        quantity = int(leading.group(1))
+        name = name[leading.end():]
+    name = " ".join(re.sub(r"[^A-Za-z0-9&'\- ]", " ", name).split())
+    if len(re.sub(r"[^A-Za-z]", "", name)) < 2 or price <= 0:
+        return None
+    return {"Item": name.title(), "Quantity": max(quantity, 1), "Price": price}
+
+
+def parse_receipt_lines(text):
+    for line in text.splitlines():
+        row = parse_receipt_line(line)
+        if row is not None:
+            yield row
@@ -0,0 +1,242 @@
+import bisect
+import heapq
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+RECIPE_TYPES = ["Panic", "Simple", "Gourmet"]
+
+# Optional JSON file (a list of recipes shaped like RECIPES) loaded on top of
+# the built-in catalog.
+RECIPES_FILE = os.environ.get("SMARTEXPIRE_RECIPES_FILE")
+
+RECIPES = [
+    {"name": "Scrambled Eggs", "type": "Panic", "description": "Quick and easy with pantry staples",
+     "ingredients": "Eggs, butter, salt, pepper", "time": "5 mins",
+     "instructions": "1. Beat eggs. 2. Melt butter in pan. 3. Cook eggs, stirring constantly. 4. Season to taste.",
+     "image": "https://images.unsplash.com/photo-1559847844-5315695dadae"},
+    {"name": "Boiled Eggs", "type": "Simple", "description": "Perfect for snacks or salads",
+     "ingredients": "Eggs, water", "time": "15 mins",
+     "instructions": "1. Boil water. 2. Add eggs. 3. Cook for desired doneness (6 mins soft, 12 mins hard).",
+     "image": "https://images.unsplash.com/photo-1518562180175-34a163b1c9c9"},
+    {"name": "Vegetable Frittata", "type": "Gourmet", "description": "Hearty meal with fresh veggies",
+     "ingredients": "Eggs, mixed vegetables, cheese, fresh herbs", "time": "30 mins",
+     "instructions": "1. Sauté vegetables. 2. Beat eggs with seasoning. 3. Combine in oven-safe pan. 4. Bake at 180°C for 20 mins.",
+     "image": "https://images.unsplash.com/photo-1547592180-85f173990554"},
+    {"name": "Milk Smoothie", "type": "Panic", "description": "Quick drink with pantry items",
+     "ingredients": "Milk, sugar, vanilla", "time": "5 mins",
+     "instructions": "1. Blend all ingredients until smooth. 2. Serve chilled.",
+     "image": "https://images.unsplash.com/photo-1505576399279-565b52d4ac71"},
+    {"name": "Pancakes", "type": "Simple", "description": "Fluffy breakfast treat",
+     "ingredients": "Milk, flour, eggs, baking powder", "time": "20 mins",
+     "instructions": "1. Mix dry ingredients. 2. Add wet ingredients. 3. Cook on griddle.",
+     "image": "https://images.unsplash.com/photo-1550583724-b2692b85b150"},
+    {"name": "Creamy Mushroom Pasta", "type": "Gourmet", "description": "Rich dinner option",
+     "ingredients": "Milk, pasta, mushrooms, cream, parmesan", "time": "30 mins",
+     "instructions": "1. Sauté mushrooms. 2. Make cream sauce with milk. 3. Toss with pasta and cheese.",
+     "image": "https://images.unsplash.com/photo-1555949258-eb67b1ef0ceb"},
+]
+
+# Shown when nothing in the catalog uses the item
+DEFAULT_RECIPES = [
+    {"name": "Quick Stir-fry", "type": "Panic", "description": "Fast dish with basic ingredients",
+     "ingredients": "Item, oil, salt, pepper", "time": "15 mins",
+     "instructions": "1. Slice ingredients. 2. Heat oil. 3. Stir-fry quickly. 4. Season.",
+     "image": "https://images.unsplash.com/photo-1546069901-ba9599a7e63c"},
+    {"name": "Roasted Dish", "type": "Simple", "description": "Easy prep for most items",
+     "ingredients": "Item, oil, salt, pepper", "time": "30 mins",
+     "instructions": "1. Toss with oil and seasonings. 2. Roast at 200°C until done.",
+     "image": "https://images.unsplash.com/photo-1546069901-4567c3e4e9a1"},
+    {"name": "Gourmet Casserole", "type": "Gourmet", "description": "Combine with premium ingredients",
+     "ingredients": "Item, rice/pasta, sauce, cheese, herbs", "time": "45 mins",
+     "instructions": "1. Layer ingredients. 2. Bake at 180°C for 30-40 mins.",
+     "image": "https://images.unsplash.com/photo-1551183053-bf91a1d81141"},
+]
+
+# Words that describe an item rather than name an ingredient
+STOPWORDS = {"organic", "fresh", "free", "range", "large", "small", "mixed", "whole", "and", "with", "of", "the"}
+
+# A title hit ranks a recipe above one that merely lists the ingredient
+TITLE_WEIGHT = 0.5
+
+# Fuzzy search: minimum trigram (Dice) similarity for a term to count, the
+# score a prefix match gets, and how many terms one query word may expand to
+FUZZY_THRESHOLD = 0.45
+PREFIX_SIMILARITY = 0.8
+MAX_TERM_MATCHES = 8
+
+
+def normalize_token(token):
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("oes") and len(token) > 4:
+        return token[:-2]
+    if token.endswith("s") and not token.endswith("ss") and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+# Shared by indexing and queries: fold accents and case, split on anything
+# that isn't a letter, drop descriptive words and fold plurals.
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    return [normalize_token(t) for t in re.findall(r"[a-z]+", text)
+            if t not in STOPWORDS and len(t) > 1]
+
+
+def trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _postings(token_lists):
+    index = {}
+    for recipe_id, tokens in enumerate(token_lists):
+        for token in set(tokens):
+            index.setdefault(token, []).append(recipe_id)
+    return {token: np.array(ids, dtype=np.int32) for token, ids in index.items()}
+
+
+class RecipeCatalog:
+    """Recipes plus inverted indexes from normalized tokens to recipe IDs.
+
+    Built once per process; lookups only touch the postings of the query's
+    tokens, so they stay fast however large the catalog gets.
+    """
+
+    def __init__(self, recipes, defaults=DEFAULT_RECIPES):
+        self.recipes = list(recipes)
+        self.defaults = list(defaults)
+        self.types = np.array([RECIPE_TYPES.index(r["type"]) if r["type"] in RECIPE_TYPES else -1
+                               for r in self.recipes], dtype=np.int8)
+        self.ingredient_index = _postings(tokenize(r["ingredients"]) for r in self.recipes)
+        self.title_index = _postings(tokenize(r["name"]) for r in self.recipes)
+        # Character-trigram index over every indexed term, for typo-tolerant
+        # and prefix search
+        self.terms = sorted(set(self.ingredient_index) | set(self.title_index))
+        self.term_trigram_counts = np.zeros(len(self.terms), dtype=np.int32)
+        trigram_index = {}
+        for term_id, term in enumerate(self.terms):
+            grams = trigrams(term)
+            self.term_trigram_counts[term_id] = len(grams)
+            for gram in grams:
+                trigram_index.setdefault(gram, []).append(term_id)
+        self.trigram_index = {gram: np.array(ids, dtype=np.int32) for gram, ids in trigram_index.items()}
+
+    def __len__(self):
+        return len(self.recipes)
+
+    # Recipe IDs and scores for everything matching the query, best first
+    def search(self, query):
+        tokens = set(tokenize(query))
+        ingredient_hits = [self.ingredient_index[t] for t in tokens if t in self.ingredient_index]
+        if not ingredient_hits:
+            return np.empty(0, dtype=np.int32), np.empty(0)
+        ids, counts = np.unique(np.concatenate(ingredient_hits), return_counts=True)
+        scores = counts.astype(float)
+        title_hits = [self.title_index[t] for t in tokens if t in self.title_index]
+        if title_hits:
+            title_ids, title_counts = np.unique(np.concatenate(title_hits), return_counts=True)
+            positions = np.searchsorted(ids, title_ids)
+            found = (positions < len(ids)) & (ids[np.minimum(positions, len(ids) - 1)] == title_ids)
+            scores[positions[found]] += TITLE_WEIGHT * title_counts[found]
+        order = np.lexsort((ids, -scores))
+        return ids[order], scores[order]
+
+    # Best recipe of each type (Panic, Simple, Gourmet) for one item
+    def for_item(self, item):
+        ids, _ = self.search(item)
+        picks = []
+        for type_code in range(len(RECIPE_TYPES)):
+            of_type = ids[self.types[ids] == type_code]
+            if len(of_type):
+                picks.append(self.recipes[of_type[0]])
+        return picks or list(self.defaults)
+
+    # The ingredient index is the recipe x ingredient matrix stored by column,
+    # so the recipes using an item are the union of its tokens' columns.
+    def recipes_using(self, item):
+        hits = [self.ingredient_index[t] for t in set(tokenize(item)) if t in self.ingredient_index]
+        if not hits:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(hits))
+
+    def rank_for_items(self, items, days_left, k=3):
+        """Top-k recipes for using up several items at once.
+
+        Each recipe scores the sum of the urgency weights of the items it
+        uses, where an item's weight is 1 / (1 + days left). Returns
+        (recipe, items used) pairs, best first.
+        """
+        item_ids = [self.recipes_using(item) for item in items]
+        if not any(len(ids) for ids in item_ids):
+            return []
+        weights = 1.0 / (1.0 + np.maximum(np.asarray(days_left, dtype=float), 0))
+        all_ids = np.concatenate(item_ids)
+        scores = np.bincount(all_ids, weights=np.repeat(weights, [len(ids) for ids in item_ids]),
+                             minlength=len(self.recipes))
+        uses = np.bincount(all_ids, minlength=len(self.recipes))
+        candidates = np.unique(all_ids)
+        top = heapq.nlargest(k, candidates.tolist(), key=lambda r: (scores[r], uses[r], -r))
+        item_sets = [set(ids.tolist()) for ids in item_ids]
+        return [(self.recipes[r], [item for item, ids in zip(items, item_sets) if r in ids]) for r in top]
+
+
+    # Indexed terms resembling a query word, as (term, similarity) pairs
+    def match_terms(self, token, prefix=False):
+        similarity = {}
+        grams = trigrams(token)
+        hits = [self.trigram_index[g] for g in grams if g in self.trigram_index]
+        if hits:
+            shared = np.bincount(np.concatenate(hits), minlength=len(self.terms))
+            candidates = np.flatnonzero(shared)
+            dice = 2 * shared[candidates] / (len(grams) + self.term_trigram_counts[candidates])
+            keep = dice >= FUZZY_THRESHOLD
+            similarity = dict(zip(candidates[keep].tolist(), dice[keep].tolist()))
+        if prefix and len(token) >= 2:
+            start = bisect.bisect_left(self.terms, token)
+            end = bisect.bisect_left(self.terms, token + "{", start)  # "{" sorts right after "z"
+            for term_id in range(start, min(end, start + MAX_TERM_MATCHES)):
+                similarity[term_id] = max(similarity.get(term_id, 0), PREFIX_SIMILARITY)
+        best = heapq.nlargest(MAX_TERM_MATCHES, similarity.items(), key=lambda pair: pair[1])
+        return [(self.terms[term_id], sim) for term_id, sim in best]
+
+    def fuzzy_search(self, query, k=6):
+        """Typo-tolerant, as-you-type search over recipe titles and ingredients.
+
+        Each query word counts once per recipe, via its best-matching term;
+        the last word is also matched as a prefix. Returns (recipe, score)
+        pairs, best first.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        scores = np.zeros(len(self.recipes))
+        for position, token in enumerate(tokens):
+            best = np.zeros(len(self.recipes))
+            for term, sim in self.match_terms(token, prefix=position == len(tokens) - 1):
+                for index, weight in ((self.ingredient_index, sim), (self.title_index, sim * (1 + TITLE_WEIGHT))):
+                    ids = index.get(term)
+                    if ids is not None:
+                        best[ids] = np.maximum(best[ids], weight)
+            scores += best
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return [(self.recipes[r], float(scores[r])) for r in candidates]
+
+
+def load_catalog(path=RECIPES_FILE):
+    recipes = list(RECIPES)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for recipe in json.load(f):
+                if isinstance(recipe.get("ingredients"), list):
+                    recipe["ingredients"] = ", ".join(recipe["ingredients"])
+                recipes.append(recipe)
+    return RecipeCatalog(recipes)
+
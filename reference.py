@@ -0,0 +1,136 @@
+import datetime
+import os
+import threading
+from types import MappingProxyType
+
+import pandas as pd
+
+from inventory import CATEGORIES, typed_inventory, typed_used_items
+from recipes import RECIPES_FILE, load_catalog
+
+# Bump when the reference data defined in code changes; edits to the style
+# sheet or recipes file are picked up from their modification times.
+REFERENCE_VERSION = 1
+
+STYLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "style.css")
+
+MODE_DISPOSAL = {
+    "pharmacy": {"instructions": "Return to pharmacy for safe disposal. Do not flush or throw in trash.",
+                 "reason": "Prevents environmental contamination and misuse."},
+    "cosmetics": {"instructions": "Check for recycling symbols. Dispose in appropriate recycling bin or return to store programs.",
+                  "reason": "Reduces plastic waste."},
+    "cleaning": {"instructions": "Empty contents safely and recycle container if possible.",
+                 "reason": "Prevents chemical contamination."},
+    "pet_care": {"instructions": "Compost organic waste or dispose in food waste bin. Recycle packaging.",
+                 "reason": "Reduces landfill waste."},
+}
+
+# Grocery disposal advice by category
+CATEGORY_DISPOSAL = {
+    "Dairy": {"instructions": "Compost or dispose in food waste bin.", "reason": "Reduces landfill methane."},
+    "Meat": {"instructions": "Wrap securely and dispose in food waste bin.", "reason": "Prevents odor and pests."},
+    "Vegetable": {"instructions": "Compost or dispose in food waste bin.", "reason": "Breaks down easily."},
+    "Fruit": {"instructions": "Compost or dispose in food waste bin.", "reason": "Breaks down easily."},
+    "Bakery": {"instructions": "Compost or dispose in food waste bin.", "reason": "Breaks down easily."},
+}
+DEFAULT_DISPOSAL = {"instructions": "Dispose in food waste bin or trash.", "reason": "Reduces environmental impact."}
+
+# Sample items shown until the user adds their own. Dates are days from today.
+SAMPLE_ITEMS = {
+    "grocery": [
+        {"Item": "Eggs", "Category": "Dairy", "Quantity": 12, "Purchase Date": -5, "Expiry Date": 10,
+         "Opened": False, "Calories": 155, "Storage": "Refrigerate at 4°C", "Notes": "Best used within 3 weeks",
+         "Best Before": 10, "Use By": 12, "Best Stored": "In original carton in refrigerator"},
+        {"Item": "Organic Milk", "Category": "Dairy", "Quantity": 1, "Purchase Date": -2, "Expiry Date": 3,
+         "Opened": False, "Calories": 103, "Storage": "Refrigerate at 4°C", "Notes": "Consume within 7 days of opening",
+         "Best Before": 3, "Use By": 5, "Best Stored": "In refrigerator door"},
+        {"Item": "Free-Range Chicken Breast", "Category": "Meat", "Quantity": 2, "Purchase Date": -1, "Expiry Date": 2,
+         "Opened": False, "Calories": 165, "Storage": "Refrigerate at 2°C", "Notes": "Use or freeze by expiry",
+         "Best Before": 2, "Use By": 3, "Best Stored": "In coldest part of refrigerator"},
+    ],
+    "pharmacy": [
+        {"Item": "Ibuprofen", "Category": "Pain Relief", "Quantity": 30, "Purchase Date": -30, "Expiry Date": 180,
+         "Opened": True, "Calories": 0, "Storage": "Store at room temperature", "Notes": "Take 1-2 tablets every 4-6 hours",
+         "Best Before": 180, "Use By": 200, "Best Stored": "In a cool, dry place away from sunlight"},
+    ],
+    "cosmetics": [
+        {"Item": "Moisturizer", "Category": "Skincare", "Quantity": 1, "Purchase Date": -60, "Expiry Date": 300,
+         "Opened": True, "Calories": 0, "Storage": "Store in cool, dry place", "Notes": "Use within 6 months of opening",
+         "Best Before": 300, "Use By": 330, "Best Stored": "Away from direct sunlight"},
+    ],
+    "cleaning": [
+        {"Item": "Dish Soap", "Category": "Kitchen", "Quantity": 1, "Purchase Date": -10, "Expiry Date": 720,
+         "Opened": True, "Calories": 0, "Storage": "Store at room temperature", "Notes": "Safe for all dishes",
+         "Best Before": 720, "Use By": 750, "Best Stored": "Under sink"},
+    ],
+    "pet_care": [
+        {"Item": "Dog Food", "Category": "Pet Food", "Quantity": 1, "Purchase Date": -5, "Expiry Date": 180,
+         "Opened": True, "Calories": 350, "Storage": "Store in cool, dry place", "Notes": "Feed 2 cups daily",
+         "Best Before": 180, "Use By": 200, "Best Stored": "In airtight container"},
+    ],
+}
+
+SAMPLE_USED_ITEMS = [
+    {"Item": "Organic Carrots", "Category": "Vegetable", "Quantity": 5, "Used On": -2,
+     "Used In": "Carrot Soup", "Notes": "Used all", "Type": "grocery"},
+]
+
+
+def _mtime(path):
+    return os.path.getmtime(path) if path and os.path.exists(path) else 0
+
+
+def reference_version():
+    """Cache key for ReferenceData; changes whenever its sources do."""
+    return (REFERENCE_VERSION, _mtime(STYLE_FILE), _mtime(RECIPES_FILE))
+
+
+def _dated(rows, date_columns, today):
+    return pd.DataFrame([
+        {**row, **{column: today + datetime.timedelta(days=row[column]) for column in date_columns if column in row}}
+        for row in rows
+    ])
+
+
+class ReferenceData:
+    """Static data shared read-only by every session on the server.
+
+    Sample frames are built once per mode and day and handed out as-is,
+    like Inventory partitions; callers must not modify them.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        with open(STYLE_FILE, encoding="utf-8") as f:
+            self.css = f"<style>\n{f.read()}</style>"
+        self.categories = MappingProxyType({mode: tuple(categories) for mode, categories in CATEGORIES.items()})
+        self.catalog = load_catalog()
+        self._mode_disposal = MappingProxyType({mode: MappingProxyType(info) for mode, info in MODE_DISPOSAL.items()})
+        self._category_disposal = MappingProxyType(
+            {category: MappingProxyType(info) for category, info in CATEGORY_DISPOSAL.items()})
+        self._default_disposal = MappingProxyType(DEFAULT_DISPOSAL)
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def disposal_info(self, category, mode):
+        if mode in self._mode_disposal:
+            return self._mode_disposal[mode]
+        return self._category_disposal.get(category, self._default_disposal)
+
+    def _sample(self, key, build):
+        with self._lock:
+            if key not in self._samples:
+                # Only today's samples are kept
+                self._samples = {k: v for k, v in self._samples.items() if k[-1] == key[-1]}
+                self._samples[key] = build()
+            return self._samples[key]
+
+    def sample_items(self, mode, today=None):
+        today = today or datetime.date.today()
+        return self._sample((mode, today), lambda: typed_inventory(
+            _dated(SAMPLE_ITEMS[mode], ["Purchase Date", "Expiry Date", "Best Before", "Use By"], today)
+            .assign(Type=mode)))
+
+    def sample_used_items(self, today=None):
+        today = today or datetime.date.today()
+        return self._sample(("used", today), lambda: typed_used_items(_dated(SAMPLE_USED_ITEMS, ["Used On"], today)))
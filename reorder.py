@@ -0,0 +1,123 @@
+"""Reorder suggestions from how fast each item gets used.
+
+ConsumptionRates keeps, per mode and normalized item name, the number of
+Used events, the quantity used and the first and last use date. That gives
+a mean interval between uses and a daily usage rate, and a new Used event
+updates it in O(1) instead of refitting from the history. Suggestions are
+computed for a whole mode at once: stock on hand from the inventory, when
+it runs out at the item's rate, and the date to reorder by.
+"""
+import datetime
+
+import pandas as pd
+
+from analytics import normalize_name, normalize_names
+
+# Days between ordering an item and having it in the house
+LEAD_DAYS = 2
+# Items to reorder within this many days are suggested
+HORIZON_DAYS = 7
+# Items not used for this many of their usual intervals are left out
+STALE_INTERVALS = 3
+
+RATE_COLUMNS = ["Item", "Category", "Interval", "Per Day", "Last Used"]
+SUGGESTION_COLUMNS = ["Item", "Category", "In Stock", "Runs Out", "Reorder By"]
+
+
+class ConsumptionRates:
+    """Per-item usage counts and dates, partitioned by mode.
+
+    Each entry is [uses, quantity, first use, last use, name, category],
+    with the name and category as last used. Each mode's rate frame is
+    built from its entries when read and cached until the mode changes.
+    """
+
+    def __init__(self):
+        self._items = {}  # mode -> {normalized name: entry}
+        self._frames = {}  # mode -> rate frame
+
+    def _merge(self, mode, key, uses, quantity, first, last, item, category):
+        entries = self._items.setdefault(mode, {})
+        entry = entries.get(key)
+        if entry is None:
+            entries[key] = [uses, quantity, first, last, item, category]
+        else:
+            entry[0] += uses
+            entry[1] += quantity
+            entry[2] = min(entry[2], first)
+            if last >= entry[3]:
+                entry[3:] = [last, item, category]
+        self._frames.pop(mode, None)
+
+    def record(self, mode, item, category, quantity, used_on):
+        used_on = pd.Timestamp(used_on).normalize()
+        self._merge(mode, normalize_name(item), 1, int(quantity), used_on, used_on, item, category)
+
+    # Used-item records as appended to the log
+    def record_many(self, records):
+        for r in records:
+            self.record(r["Type"], r["Item"], r["Category"], r["Quantity"], r["Used On"])
+
+    # A typed used-items frame: one entry update per distinct item
+    def record_frame(self, df):
+        if df.empty:
+            return
+        df = df.assign(Key=normalize_names(df["Item"]), Quantity=df["Quantity"].fillna(1).astype("int64"))
+        groups = df.sort_values("Used On", kind="stable").groupby(["Type", "Key"], observed=True, sort=False).agg(
+            uses=("Item", "size"), quantity=("Quantity", "sum"), first=("Used On", "min"), last=("Used On", "max"),
+            item=("Item", "last"), category=("Category", "last"))
+        for (mode, key), uses, quantity, first, last, item, category in groups.itertuples(name=None):
+            self._merge(mode, key, int(uses), int(quantity), first, last, item, str(category))
+
+    def frame(self, mode):
+        """Items of one mode used at least twice, on different days, indexed
+        by normalized name: mean days between uses, quantity used per day
+        and the last use date."""
+        frame = self._frames.get(mode)
+        if frame is not None:
+            return frame
+        entries = pd.DataFrame.from_dict(self._items.get(mode, {}), orient="index",
+                                         columns=["uses", "quantity", "first", "last", "item", "category"])
+        if entries.empty:
+            frame = pd.DataFrame(columns=RATE_COLUMNS)
+        else:
+            span = (pd.to_datetime(entries["last"]) - pd.to_datetime(entries["first"])).dt.days
+            entries = entries[(entries["uses"] > 1) & (span > 0)]
+            interval = span[entries.index] / (entries["uses"] - 1)
+            frame = pd.DataFrame({
+                "Item": entries["item"],
+                "Category": entries["category"],
+                "Interval": interval,
+                "Per Day": entries["quantity"] / entries["uses"] / interval,
+                "Last Used": pd.to_datetime(entries["last"]),
+            }, columns=RATE_COLUMNS)
+        self._frames[mode] = frame
+        return frame
+
+
+def reorder_suggestions(rates, items, today=None, lead_days=LEAD_DAYS, horizon=HORIZON_DAYS):
+    """Items to reorder within `horizon` days, soonest first.
+
+    `rates` is a mode's rate frame and `items` its inventory. An item in
+    stock runs out when the stock is used up at the item's daily rate; one
+    that isn't runs out at its next expected use. The reorder date is
+    `lead_days` before that, and never before today.
+    """
+    if rates.empty:
+        return pd.DataFrame(columns=SUGGESTION_COLUMNS)
+    today = pd.Timestamp(today or datetime.date.today())
+    stock = items["Quantity"].fillna(0).astype("int64").groupby(normalize_names(items["Item"])).sum()
+    in_stock = stock.reindex(rates.index, fill_value=0)
+    interval = pd.to_timedelta(rates["Interval"], unit="D")
+    next_use = (rates["Last Used"] + interval).clip(lower=today)
+    runs_out = (today + pd.to_timedelta(in_stock / rates["Per Day"], unit="D")).where(in_stock > 0, next_use).dt.floor("D")
+    reorder_by = (runs_out - pd.Timedelta(days=lead_days)).clip(lower=today)
+    active = today - rates["Last Used"] <= interval * STALE_INTERVALS
+    due = active & (reorder_by <= today + pd.Timedelta(days=horizon))
+    return pd.DataFrame({
+        "Item": rates["Item"],
+        "Category": rates["Category"],
+        "In Stock": in_stock,
+        "Runs Out": runs_out,
+        "Reorder By": reorder_by,
+    }, columns=SUGGESTION_COLUMNS)[due].sort_values("Reorder By")
@@ -0,0 +1,120 @@
+"""Recurring usage schedules for the non-grocery modes.
+
+Each entry's times of day and days are compiled once, when it's added, into
+weekly dose slots counted in minutes from Monday 00:00. Every mode keeps its
+slots in one sorted index, so the doses due in the next N hours are two
+bisections plus the doses returned, however many entries the mode has.
+"""
+import bisect
+import datetime
+import itertools
+import re
+
+TIMES_OF_DAY = {"Morning": "08:00", "Afternoon": "13:00", "Evening": "18:00", "Night": "22:00"}
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+DAY_OPTIONS = ["Daily"] + WEEKDAYS
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+_CLOCK = re.compile(r"(\d{1,2})[:.](\d{2})\s*([ap]m)?", re.IGNORECASE)
+
+
+def clock_minutes(time):
+    """Minutes after midnight of a time-of-day label ("Morning") or a clock
+    time such as "07:30" or "9.15pm"."""
+    time = str(time).strip()
+    match = _CLOCK.fullmatch(TIMES_OF_DAY.get(time.capitalize(), time))
+    if not match:
+        raise ValueError(f"Unrecognised time of day: {time!r}")
+    hours, minutes, meridiem = int(match[1]), int(match[2]), (match[3] or "").lower()
+    if meridiem:
+        hours = hours % 12 + (12 if meridiem == "pm" else 0)
+    if hours > 23 or minutes > 59:
+        raise ValueError(f"Unrecognised time of day: {time!r}")
+    return hours * 60 + minutes
+
+
+def weekdays(days):
+    """Weekday numbers (Monday is 0). No days, or "Daily", means every day."""
+    names = {str(day).strip().capitalize() for day in days}
+    if not names or "Daily" in names:
+        return list(range(7))
+    unknown = names.difference(WEEKDAYS)
+    if unknown:
+        raise ValueError(f"Unrecognised day: {sorted(unknown)[0]!r}")
+    return sorted(WEEKDAYS.index(name) for name in names)
+
+
+def dose_slots(times, days):
+    """An entry's doses as sorted minutes of the week. Entries without a
+    time of day are taken as needed and have no slots."""
+    minutes = sorted({clock_minutes(time) for time in times})
+    return [day * MINUTES_PER_DAY + minute for day in weekdays(days) for minute in minutes]
+
+
+def minute_of_week(moment):
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+
+class Schedule:
+    """Schedule entries partitioned by mode.
+
+    Each mode has its entries, in the order they were added, and a sorted
+    list of (minute of week, entry ID) dose slots. Adding or removing an
+    entry updates its mode's index; nothing is recomputed per rerun.
+    """
+
+    def __init__(self):
+        self._entries = {}  # mode -> {entry ID: entry}
+        self._slots = {}  # mode -> sorted [(minute of week, entry ID)]
+        self._ids = itertools.count()
+
+    def add(self, item, instructions, times, days, mode):
+        """Adds an entry and returns its ID; raises ValueError for a time or
+        day that can't be read."""
+        slots = dose_slots(times, days)
+        entry_id = next(self._ids)
+        self._entries.setdefault(mode, {})[entry_id] = {
+            "Item": item, "Instructions": instructions, "Times": list(times), "Days": list(days), "Type": mode,
+        }
+        index = self._slots.setdefault(mode, [])
+        for slot in slots:
+            bisect.insort(index, (slot, entry_id))
+        return entry_id
+
+    def remove(self, mode, entry_id):
+        if self._entries.get(mode, {}).pop(entry_id, None) is not None:
+            self._slots[mode] = [slot for slot in self._slots[mode] if slot[1] != entry_id]
+
+    def entries(self, mode):
+        """{entry ID: entry} for one mode, in the order added."""
+        return self._entries.get(mode, {})
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def due(self, mode, start, hours):
+        """The mode's doses from `start` (to the minute) up to `hours` later,
+        as (dose time, entry) pairs in time order. Windows longer than a
+        week are cut to one week, so each dose appears once."""
+        index = self._slots.get(mode)
+        if not index or hours <= 0:
+            return []
+        entries = self._entries[mode]
+        start = start.replace(second=0, microsecond=0)
+        week_start = start - datetime.timedelta(minutes=minute_of_week(start))
+        first = minute_of_week(start)
+        last = first + min(round(hours * 60), MINUTES_PER_WEEK)
+        doses = []
+        # A window running past Sunday night continues from the start of the
+        # index, a week later
+        for week in range(2):
+            low, high = first - week * MINUTES_PER_WEEK, last - week * MINUTES_PER_WEEK
+            if high <= 0:
+                break
+            lo = bisect.bisect_left(index, (max(low, 0),))
+            hi = bisect.bisect_left(index, (min(high, MINUTES_PER_WEEK),))
+            doses.extend((week_start + datetime.timedelta(minutes=week * MINUTES_PER_WEEK + slot), entries[entry_id])
+                         for slot, entry_id in index[lo:hi])
+        return doses
@@ -15,6 +15,7 @@ CREATE TABLE public.items (
     quantity INTEGER DEFAULT 1,
     unit VARCHAR,
     image_url VARCHAR,
+    mode VARCHAR DEFAULT 'grocery',
     user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE NOT NULL
     foodSubcategory VARCHAR (255),
 CONSTRAINT valid_food_subcategory
@@ -69,6 +70,7 @@ CREATE TABLE public.shopping_list (
     category VARCHAR NOT NULL,
     added TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::TEXT, now()) NOT NULL,
     image_url VARCHAR,
+    mode VARCHAR DEFAULT 'grocery',
     user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE NOT NULL
     foodSubcategory VARCHAR (255),
 CONSTRAINT valid_food_subcategory
@@ -85,6 +87,7 @@ CREATE TABLE public.used_items (
     used_date TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::TEXT, now()) NOT NULL,
     image_url VARCHAR,
     added_to_shopping_list BOOLEAN DEFAULT FALSE,
+    mode VARCHAR DEFAULT 'grocery',
     user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE NOT NULL
     foodSubcategory VARCHAR (255),
 CONSTRAINT valid_food_subcategory
@@ -146,6 +149,8 @@ CREATE POLICY "Enable delete access for own used_items" ON public.used_items FOR
 
 -- Indices for potential performance improvements
 CREATE INDEX idx_items_user_id ON public.items (user_id);
+-- Keyset pagination by household for the expiry alert scanner (alerts.py)
+CREATE INDEX idx_items_user_id_id ON public.items (user_id, id);
 CREATE INDEX idx_reciepts_user_id ON public.reciepts (user_id);
 CREATE INDEX idx_recipes_user_id ON public.recipes (user_id);
 CREATE INDEX idx_shopping_list_user_id ON public.shopping_list (user_id);
@@ -0,0 +1,76 @@
+import uuid
+from collections import OrderedDict
+
+from analytics import normalize_name
+
+
+class ShoppingList:
+    """Shopping list entries keyed by mode and normalized item name, in the
+    order added.
+
+    An entry is a dict with the row ID, Item, Quantity, Unit, Category and
+    Type (mode), like a shopping_list row. Adding a name that's already on
+    the mode's list adds to that entry's quantity, so "Milk" and "milk " are
+    one entry, while "Shampoo" in cosmetics and in pet care are two; lookups,
+    adds and check-offs are O(1) per name. Stored rows of the same mode that
+    normalize to the same name are merged on load into the first row's
+    entry, which lists all their IDs in "ids" so the extra rows can be
+    deleted when it's saved or checked off.
+    """
+
+    def __init__(self, rows=()):
+        self._entries = OrderedDict()
+        for row in rows:
+            entry, new = self._add(row["Item"], row["Quantity"], row["Unit"], row["Category"], row["Type"], row["id"])
+            if not new:
+                entry["ids"].append(row["id"])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    # Takes a (mode, name) pair
+    def __contains__(self, key):
+        mode, name = key
+        return (mode, normalize_name(name)) in self._entries
+
+    def get(self, name, mode):
+        return self._entries.get((mode, normalize_name(name)))
+
+    def _add(self, name, quantity, unit, category, mode, row_id=None):
+        key = (mode, normalize_name(name))
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry["Quantity"] += quantity
+            return entry, False
+        entry = {"id": row_id or str(uuid.uuid4()), "Item": name, "Quantity": quantity, "Unit": unit,
+                 "Category": category, "Type": mode}
+        entry["ids"] = [entry["id"]]
+        self._entries[key] = entry
+        return entry, True
+
+    def add(self, items, mode):
+        """Adds (name, category, quantity) triples; returns the entries added
+        or merged into, once each, and how many of them are new."""
+        changed = OrderedDict()
+        new = 0
+        for name, category, quantity in items:
+            entry, is_new = self._add(name, int(quantity), "unit", category, mode)
+            changed[entry["id"]] = entry
+            new += is_new
+        return list(changed.values()), new
+
+    def remove(self, names, mode):
+        """Checks off a mode's entries by name; returns the entries removed."""
+        removed = (self._entries.pop((mode, normalize_name(name)), None) for name in names)
+        return [entry for entry in removed if entry is not None]
+
+    def by_category(self, mode):
+        """{category: [entries]} for one mode, in one pass over the list."""
+        groups = {}
+        for entry in self._entries.values():
+            if entry["Type"] == mode:
+                groups.setdefault(entry["Category"], []).append(entry)
+        return groups
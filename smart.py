@@ -3,9 +3,21 @@ import pandas as pd
 import datetime
 import random
 from PIL import Image
+from streamlit.errors import StreamlitAPIException
 from streamlit_option_menu import option_menu
-import pytesseract  # For OCR receipt scanning
 import io
+import base64
+from analytics import PriceBook
+from inventory import Inventory, UsedItemsLog, card_fields, receipt_items, typed_inventory
+from profiling import NOT_PROFILING, RerunProfiler, profiling_requested
+from receipts import OcrService, ReceiptLog, parse_receipt_lines, receipt_digest
+from reference import ReferenceData, reference_version
+from reorder import reorder_suggestions
+from schedules import DAY_OPTIONS, TIMES_OF_DAY, Schedule
+from shopping import ShoppingList
+from storage import open_store
+from transfer import (FORMATS, ImportReport, file_format, read_items, read_used_items, write_items,
+                      write_used_items)
 
 # Set page config
 st.set_page_config(
@@ -15,309 +27,46 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS (Updated to include new styles for added features)
-st.markdown("""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;600;700&family=Montserrat:wght@400;700&display=swap');
-    
-    html, body, [class*="css"] {
-        font-family: 'Poppins', sans-serif;
-        font-size: 16px;
-        color: #333;
-    }
-    
-    .main {
-        background-color: #f5f7fa;
-    }
-    
-    .header-title {
-        font-family: 'Montserrat', sans-serif;
-        font-weight: 700;
-        color: #2e7d32;
-        font-size: 3.8rem !important;
-        text-align: center;
-        margin-bottom: 0.5rem;
-    }
-    
-    .mission-statement {
-        font-family: 'Poppins', sans-serif;
-        color: #4caf50;
-        font-size: 1.4rem !important;
-        text-align: center;
-        margin-bottom: 2rem;
-        font-weight: 300;
-    }
-    
-    .header-subtitle {
-        font-family: 'Montserrat', sans-serif;
-        color: #2e7d32;
-        font-size: 2rem !important;
-        margin-top: 0 !important;
-    }
-    
-    .sidebar .sidebar-content {
-        background: linear-gradient(to bottom, #e8f5e9, #c8e6c9);
-    }
-    
-    .expiring-soon {
-        background-color: #ffebee !important;
-        border-left: 6px solid #e53935 !important;
-        border-radius: 10px;
-        padding: 20px;
-        margin-bottom: 15px;
-        box-shadow: 0 3px 6px rgba(0,0,0,0.1);
-        font-size: 1.1rem;
-    }
-    
-    .expiring-moderate {
-        background-color: #fff3e0 !important;
-        border-left: 6px solid #fb8c00 !important;
-        border-radius: 10px;
-        padding: 20px;
-        margin-bottom: 15px;
-        box-shadow: 0 3px 6px rgba(0,0,0,0.1);
-        font-size: 1.1rem;
-    }
-    
-    .expiring-fine {
-        background-color: #e8f5e9 !important;
-        border-left: 6px solid #4caf50 !important;
-        border-radius: 10px;
-        padding: 20px;
-        margin-bottom: 15px;
-        box-shadow: 0 3px 6px rgba(0,0,0,0.1);
-        font-size: 1.1rem;
-    }
-    
-    .recipe-card {
-        border: 1px solid #c8e6c9;
-        border-radius: 12px;
-        padding: 25px;
-        margin-bottom: 25px;
-        background-color: white;
-        box-shadow: 0 4px 8px rgba(0,0,0,0.08);
-        transition: transform 0.3s ease;
-    }
-    
-    .recipe-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 6px 12px rgba(0,0,0,0.15);
-    }
-    
-    .stButton button {
-        background-color: #4caf50;
-        color: white;
-        border: none;
-        border-radius: 10px;
-        padding: 10px 20px;
-        font-size: 1rem;
-        font-weight: 600;
-        transition: all 0.3s ease;
-        margin-right: 10px;
-    }
-    
-    .stButton button:hover {
-        background-color: #388e3c;
-        transform: scale(1.05);
-    }
-    
-    .card {
-        border-radius: 12px;
-        padding: 25px;
-        background-color: white;
-        box-shadow: 0 4px 8px rgba(0,0,0,0.08);
-        margin-bottom: 25px;
-    }
-    
-    .stat-card {
-        background-color: white;
-        border-radius: 12px;
-        padding: 20px;
-        box-shadow: 0 4px 8px rgba(0,0,0,0.08);
-        text-align: center;
-    }
-    
-    .stat-value {
-        font-size: 2.5rem;
-        font-weight: 700;
-        color: #2e7d32;
-        margin-bottom: 0;
-    }
-    
-    .stat-label {
-        font-size: 1rem;
-        color: #616161;
-        margin-top: 0;
-    }
-    
-    .panic-tag {
-        background-color: #ffebee;
-        color: #c62828;
-        padding: 5px 10px;
-        border-radius: 5px;
-        font-size: 0.9rem;
-        font-weight: 600;
-    }
-    
-    .simple-tag {
-        background-color: #fff8e1;
-        color: #ff8f00;
-        padding: 5px 10px;
-        border-radius: 5px;
-        font-size: 0.9rem;
-        font-weight: 600;
-    }
-    
-    .gourmet-tag {
-        background-color: #e3f2fd;
-        color: #1565c0;
-        padding: 5px 10px;
-        border-radius: 5px;
-        font-size: 0.9rem;
-        font-weight: 600;
-    }
-    
-    .leaf-icon {
-        color: #4caf50;
-        font-size: 1.4rem;
-        margin-right: 8px;
-    }
-    
-    .logo-container {
-        display: flex;
-        align-items: center;
-        margin-bottom: 25px;
-        padding: 15px;
-        background-color: #2e7d32;
-        border-radius: 12px;
-    }
-    
-    .logo-text {
-        color: white;
-        font-family: 'Montserrat', sans-serif;
-        font-weight: 700;
-        font-size: 1.8rem;
-        margin-left: 12px;
-    }
-    
-    .ocr-upload {
-        border: 2px dashed #4caf50;
-        border-radius: 12px;
-        padding: 25px;
-        text-align: center;
-        margin-bottom: 25px;
-    }
-    
-    .panic-mode {
-        animation: pulse 2s infinite;
-        background-color: #ffebee;
-        border-radius: 12px;
-        padding: 15px;
-        text-align: center;
-        margin-bottom: 25px;
-        font-size: 1.2rem;
-    }
-    
-    @keyframes pulse {
-        0% { transform: scale(1); }
-        50% { transform: scale(1.03); }
-        100% { transform: scale(1); }
-    }
-    
-    .disposal-info {
-        background-color: #e3f2fd;
-        border-radius: 12px;
-        padding: 20px;
-        margin-bottom: 20px;
-        font-size: 1.1rem;
-    }
-    
-    .medication-alert {
-        background-color: #fff8e1;
-        border-left: 6px solid #ffc107;
-        border-radius: 10px;
-        padding: 20px;
-        margin-bottom: 15px;
-        font-size: 1.1rem;
-    }
-    
-    .search-bar {
-        margin-bottom: 25px;
-        padding: 15px;
-        border-radius: 10px;
-        background-color: white;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.08);
-    }
-    
-    .stTextInput input {
-        font-size: 1.1rem;
-        padding: 10px;
-        border-radius: 8px;
-    }
-    
-    .info-button {
-        background-color: #2196F3 !important;
-    }
-    
-    .used-button {
-        background-color: #ff9800 !important;
-    }
-    
-    .add-shopping-button {
-        background-color: #9c27b0 !important;
-    }
-    
-    .favorite-button {
-        background-color: #e91e63 !important;
-    }
-    
-    .used-items-sidebar {
-        background-color: #e8f5e9;
-        border-radius: 12px;
-        padding: 20px;
-        margin-bottom: 25px;
-    }
-    
-    .favorite-recipes {
-        background-color: #e8f5e9;
-        border-radius: 12px;
-        padding: 20px;
-        margin-bottom: 25px;
-    }
-    
-    .smartcard {
-        background: linear-gradient(to right, #4caf50, #2e7d32);
-        color: white;
-        border-radius: 12px;
-        padding: 25px;
-        text-align: center;
-        margin-bottom: 25px;
-    }
-    
-    .receipt-card {
-        border: 1px solid #c8e6c9;
-        border-radius: 12px;
-        padding: 20px;
-        margin-bottom: 20px;
-        background-color: white;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+# Rerun instrumentation, for sessions opened with ?profile=1 or every session
+# when SMARTEXPIRE_PROFILE is set: times page sections and hot paths, counts
+# widgets and payload bytes per run. Samples are pooled across sessions.
+@st.cache_resource
+def get_profiler():
+    return RerunProfiler()
+
+profiler = get_profiler() if profiling_requested(st.query_params) else NOT_PROFILING
+profiler.start_run()
+
+# Reference data (styles, categories, disposal advice, sample items, recipes)
+# is built once per server process and shared read-only by every session.
+# A new version (code change or edited style/recipe file) replaces it.
+@st.cache_resource(max_entries=1)
+def get_reference_data(version):
+    return ReferenceData(version)
+
+reference = get_reference_data(reference_version())
 
-# Initialize session state
-if 'grocery_data' not in st.session_state:
-    st.session_state.grocery_data = pd.DataFrame(columns=[
-        "Item", "Category", "Quantity", "Purchase Date", "Expiry Date", 
-        "Opened", "Calories", "Storage", "Notes", "Type", "Best Before", "Use By", "Best Stored"
-    ])
+st.markdown(reference.css, unsafe_allow_html=True)
+
+# One connection pool and write-behind buffer per server process; None when
+# SMARTEXPIRE_DATABASE_URL isn't set, in which case everything stays in the
+# session as before.
+@st.cache_resource
+def get_store():
+    return open_store()
+
+store = get_store()
+
+# Initialize session state. With a store, stored rows are loaded lazily and
+# session state only caches them.
+if 'inventory' not in st.session_state:
+    st.session_state.inventory = Inventory(loader=store.load_items if store else None)
 
 if 'used_items' not in st.session_state:
-    st.session_state.used_items = pd.DataFrame(columns=[
-        "Item", "Category", "Quantity", "Used On", "Used In", "Notes", "Type"
-    ])
+    st.session_state.used_items = UsedItemsLog(loader=store.load_used_items if store else None)
 
 if 'shopping_list' not in st.session_state:
-    st.session_state.shopping_list = []
+    st.session_state.shopping_list = ShoppingList(store.load_shopping_list() if store else ())
 
 if 'show_info' not in st.session_state:
     st.session_state.show_info = {}
@@ -332,169 +81,107 @@ if 'mode' not in st.session_state:
     st.session_state.mode = "grocery"
 
 if 'medication_schedule' not in st.session_state:
-    st.session_state.medication_schedule = []
+    st.session_state.medication_schedule = Schedule()
+
+# (mode, normalized name) of items already put on the shopping list as reorders
+if 'suggested_reorders' not in st.session_state:
+    st.session_state.suggested_reorders = set()
 
 if 'favorite_recipes' not in st.session_state:
     st.session_state.favorite_recipes = []
 
-if 'past_receipts' not in st.session_state:
-    st.session_state.past_receipts = []
+# Unit prices from this session's receipts, for the savings figures
+if 'prices' not in st.session_state:
+    st.session_state.prices = PriceBook()
 
-# Sample data
-def load_sample_data(mode):
-    today = datetime.date.today()
-    if mode == "grocery":
-        return pd.DataFrame([
-            {"Item": "Eggs", "Category": "Dairy", "Quantity": 12, "Purchase Date": today - datetime.timedelta(days=5), 
-             "Expiry Date": today + datetime.timedelta(days=10), "Opened": False, "Calories": 155, 
-             "Storage": "Refrigerate at 4°C", "Notes": "Best used within 3 weeks", "Type": "grocery",
-             "Best Before": today + datetime.timedelta(days=10), "Use By": today + datetime.timedelta(days=12),
-             "Best Stored": "In original carton in refrigerator"},
-            {"Item": "Organic Milk", "Category": "Dairy", "Quantity": 1, "Purchase Date": today - datetime.timedelta(days=2), 
-             "Expiry Date": today + datetime.timedelta(days=3), "Opened": False, "Calories": 103, 
-             "Storage": "Refrigerate at 4°C", "Notes": "Consume within 7 days of opening", "Type": "grocery",
-             "Best Before": today + datetime.timedelta(days=3), "Use By": today + datetime.timedelta(days=5),
-             "Best Stored": "In refrigerator door"},
-            {"Item": "Free-Range Chicken Breast", "Category": "Meat", "Quantity": 2, "Purchase Date": today - datetime.timedelta(days=1), 
-             "Expiry Date": today + datetime.timedelta(days=2), "Opened": False, "Calories": 165, 
-             "Storage": "Refrigerate at 2°C", "Notes": "Use or freeze by expiry", "Type": "grocery",
-             "Best Before": today + datetime.timedelta(days=2), "Use By": today + datetime.timedelta(days=3),
-             "Best Stored": "In coldest part of refrigerator"}
-        ])
-    elif mode == "pharmacy":
-        return pd.DataFrame([
-            {"Item": "Ibuprofen", "Category": "Pain Relief", "Quantity": 30, "Purchase Date": today - datetime.timedelta(days=30), 
-             "Expiry Date": today + datetime.timedelta(days=180), "Opened": True, "Calories": 0, 
-             "Storage": "Store at room temperature", "Notes": "Take 1-2 tablets every 4-6 hours", "Type": "pharmacy",
-             "Best Before": today + datetime.timedelta(days=180), "Use By": today + datetime.timedelta(days=200),
-             "Best Stored": "In a cool, dry place away from sunlight"}
-        ])
-    elif mode == "cosmetics":
-        return pd.DataFrame([
-            {"Item": "Moisturizer", "Category": "Skincare", "Quantity": 1, "Purchase Date": today - datetime.timedelta(days=60), 
-             "Expiry Date": today + datetime.timedelta(days=300), "Opened": True, "Calories": 0, 
-             "Storage": "Store in cool, dry place", "Notes": "Use within 6 months of opening", "Type": "cosmetics",
-             "Best Before": today + datetime.timedelta(days=300), "Use By": today + datetime.timedelta(days=330),
-             "Best Stored": "Away from direct sunlight"}
-        ])
-    elif mode == "cleaning":
-        return pd.DataFrame([
-            {"Item": "Dish Soap", "Category": "Kitchen", "Quantity": 1, "Purchase Date": today - datetime.timedelta(days=10), 
-             "Expiry Date": today + datetime.timedelta(days=720), "Opened": True, "Calories": 0, 
-             "Storage": "Store at room temperature", "Notes": "Safe for all dishes", "Type": "cleaning",
-             "Best Before": today + datetime.timedelta(days=720), "Use By": today + datetime.timedelta(days=750),
-             "Best Stored": "Under sink"}
-        ])
-    elif mode == "pet_care":
-        return pd.DataFrame([
-            {"Item": "Dog Food", "Category": "Pet Food", "Quantity": 1, "Purchase Date": today - datetime.timedelta(days=5), 
-             "Expiry Date": today + datetime.timedelta(days=180), "Opened": True, "Calories": 350, 
-             "Storage": "Store in cool, dry place", "Notes": "Feed 2 cups daily", "Type": "pet_care",
-             "Best Before": today + datetime.timedelta(days=180), "Use By": today + datetime.timedelta(days=200),
-             "Best Stored": "In airtight container"}
-        ])
-
-def load_used_items():
-    today = datetime.date.today()
-    return pd.DataFrame([
-        {"Item": "Organic Carrots", "Category": "Vegetable", "Quantity": 5, "Used On": today - datetime.timedelta(days=2), 
-         "Used In": "Carrot Soup", "Notes": "Used all", "Type": "grocery"}
-    ])
+if 'past_receipts' not in st.session_state:
+    st.session_state.past_receipts = ReceiptLog(stored=store.load_receipts() if store else ())
 
 # Recipe database
+@profiler.timed("get_recipes")
 def get_recipes(items, mode="grocery"):
     if mode != "grocery":
         return []
     
-    all_recipes = {
-        "Eggs": [
-            {"name": "Scrambled Eggs", "type": "Panic", "description": "Quick and easy with pantry staples",
-             "ingredients": "Eggs, butter, salt, pepper", "time": "5 mins",
-             "instructions": "1. Beat eggs. 2. Melt butter in pan. 3. Cook eggs, stirring constantly. 4. Season to taste.",
-             "image": "https://images.unsplash.com/photo-1559847844-5315695dadae"},
-            {"name": "Boiled Eggs", "type": "Simple", "description": "Perfect for snacks or salads",
-             "ingredients": "Eggs, water", "time": "15 mins",
-             "instructions": "1. Boil water. 2. Add eggs. 3. Cook for desired doneness (6 mins soft, 12 mins hard).",
-             "image": "https://images.unsplash.com/photo-1518562180175-34a163b1c9c9"},
-            {"name": "Vegetable Frittata", "type": "Gourmet", "description": "Hearty meal with fresh veggies",
-             "ingredients": "Eggs, mixed vegetables, cheese, fresh herbs", "time": "30 mins",
-             "instructions": "1. Sauté vegetables. 2. Beat eggs with seasoning. 3. Combine in oven-safe pan. 4. Bake at 180°C for 20 mins.",
-             "image": "https://images.unsplash.com/photo-1547592180-85f173990554"}
-        ],
-        "Organic Milk": [
-            {"name": "Milk Smoothie", "type": "Panic", "description": "Quick drink with pantry items",
-             "ingredients": "Milk, sugar, vanilla", "time": "5 mins",
-             "instructions": "1. Blend all ingredients until smooth. 2. Serve chilled.",
-             "image": "https://images.unsplash.com/photo-1505576399279-565b52d4ac71"},
-            {"name": "Pancakes", "type": "Simple", "description": "Fluffy breakfast treat",
-             "ingredients": "Milk, flour, eggs, baking powder", "time": "20 mins",
-             "instructions": "1. Mix dry ingredients. 2. Add wet ingredients. 3. Cook on griddle.",
-             "image": "https://images.unsplash.com/photo-1550583724-b2692b85b150"},
-            {"name": "Creamy Mushroom Pasta", "type": "Gourmet", "description": "Rich dinner option",
-             "ingredients": "Milk, pasta, mushrooms, cream, parmesan", "time": "30 mins",
-             "instructions": "1. Sauté mushrooms. 2. Make cream sauce with milk. 3. Toss with pasta and cheese.",
-             "image": "https://images.unsplash.com/photo-1555949258-eb67b1ef0ceb"}
-        ],
-        "default": [
-    {"name": "Quick Stir-fry", "type": "Panic", "description": "Fast dish with basic ingredients",
-     "ingredients": "Item, oil, salt, pepper", "time": "15 mins",
-     "instructions": "1. Slice ingredients. 2. Heat oil. 3. Stir-fry quickly. 4. Season.",
-     "image": "https://images.unsplash.com/photo-1546069901-ba9599a7e63c"},
-    {"name": "Roasted Dish", "type": "Simple", "description": "Easy prep for most items",
-     "ingredients": "Item, oil, salt, pepper", "time": "30 mins",
-     "instructions": "1. Toss with oil and seasonings. 2. Roast at 200°C until done.",
-     "image": "https://images.unsplash.com/photo-1546069901-4567c3e4e9a1"},
-    {"name": "Gourmet Casserole", "type": "Gourmet", "description": "Combine with premium ingredients",
-     "ingredients": "Item, rice/pasta, sauce, cheese, herbs", "time": "45 mins",
-     "instructions": "1. Layer ingredients. 2. Bake at 180°C for 30-40 mins.",
-     "image": "https://images.unsplash.com/photo-1551183053-bf91a1d81141"}
-]       
-    }
-    
     item_recipes = []
     for item in items:
-        recipes = all_recipes.get(item, all_recipes["default"])
-        # Ensure one of each type (Panic, Simple, Gourmet) if available
-        for recipe_type in ["Panic", "Simple", "Gourmet"]:
-            for recipe in recipes:
-                if recipe["type"] == recipe_type:
-                    item_recipes.append(recipe)
-                    break
+        # One of each type (Panic, Simple, Gourmet) if available
+        item_recipes.extend(reference.catalog.for_item(item))
     return item_recipes[:3]  # Return one of each type if possible
 
-# Disposal info
-def get_disposal_info(item, category, mode):
-    if mode == "pharmacy":
-        return {
-            "instructions": "Return to pharmacy for safe disposal. Do not flush or throw in trash.",
-            "reason": "Prevents environmental contamination and misuse."
-        }
-    elif mode == "cosmetics":
-        return {
-            "instructions": "Check for recycling symbols. Dispose in appropriate recycling bin or return to store programs.",
-            "reason": "Reduces plastic waste."
-        }
-    elif mode == "cleaning":
-        return {
-            "instructions": "Empty contents safely and recycle container if possible.",
-            "reason": "Prevents chemical contamination."
-        }
-    elif mode == "pet_care":
-        return {
-            "instructions": "Compost organic waste or dispose in food waste bin. Recycle packaging.",
-            "reason": "Reduces landfill waste."
-        }
-    
-    disposal_info = {
-        "Dairy": {"instructions": "Compost or dispose in food waste bin.", "reason": "Reduces landfill methane."},
-        "Meat": {"instructions": "Wrap securely and dispose in food waste bin.", "reason": "Prevents odor and pests."},
-        "Vegetable": {"instructions": "Compost or dispose in food waste bin.", "reason": "Breaks down easily."},
-        "Fruit": {"instructions": "Compost or dispose in food waste bin.", "reason": "Breaks down easily."},
-        "Bakery": {"instructions": "Compost or dispose in food waste bin.", "reason": "Breaks down easily."},
-        "default": {"instructions": "Dispose in food waste bin or trash.", "reason": "Reduces environmental impact."}
-    }
-    
-    return disposal_info.get(category, disposal_info["default"])
+RECEIPTS_PER_PAGE = 10
+EXPIRING_RECIPES = 6
+SEARCH_RESULTS = 6
+
+# OCR worker pool, shared by every session on this server
+@st.cache_resource
+def get_ocr_service():
+    return OcrService()
+
+# Seconds between checks on a receipt that's still being read
+OCR_POLL_SECONDS = 1
+
+LIST_PAGE_SIZES = [10, 25, 50]
+USED_ITEMS_SHOWN = 20
+STATS_WEEKS = 4
+
+# Move items from the inventory to the used-items history. Both sides are
+# O(1) per item: the inventory tombstones the IDs and the log buffers records.
+# Expiry date and receipt price only feed the consumption stats.
+def mark_used(mode, ids):
+    used = st.session_state.inventory.items(mode).loc[ids, ['Item', 'Category', 'Quantity', 'Notes', 'Expiry Date']]
+    today = datetime.date.today()
+    prices = st.session_state.prices
+    records = [
+        {"Item": item, "Category": category, "Quantity": quantity, "Used On": today,
+         "Used In": "Not specified", "Notes": notes, "Type": mode, "Expiry Date": expiry, "Price": prices.price(item)}
+        for item, category, quantity, notes, expiry in used.itertuples(index=False)
+    ]
+    st.session_state.used_items.append(records)
+    st.session_state.inventory.remove(mode, ids)
+    if store:
+        store.add_used_items(records)
+        store.delete_items(ids)
+
+# Add items to the inventory (and the database, if configured) in one batch
+def add_items(new_items):
+    st.session_state.inventory.add(new_items)
+    if store:
+        store.save_items(new_items)
+
+# Takes (item, category, quantity) rows. An item already on the list gets the
+# quantity added to its entry; returns how many items are new to the list.
+def add_to_shopping_list(items, mode):
+    changed, new = st.session_state.shopping_list.add(items, mode)
+    if store and changed:
+        store.save_shopping_items(changed)
+    return new
+
+# Runs as the check-off form's callback, so the list is redrawn without them
+def check_off_shopping(mode):
+    shopping_list = st.session_state.shopping_list
+    checked = [entry["Item"] for entry in shopping_list
+               if entry["Type"] == mode and st.session_state.get(f"shop_check_{entry['id']}")]
+    removed = shopping_list.remove(checked, mode)
+    if store and removed:
+        store.delete_shopping_items(removed)
+
+# Items due for reorder go on the shopping list once per session, so
+# removing one from the list sticks. Returns the suggestions not yet due.
+def add_reorders(mode):
+    suggestions = reorder_suggestions(st.session_state.used_items.rates.frame(mode),
+                                      st.session_state.inventory.items(mode))
+    due = suggestions[suggestions["Reorder By"] <= pd.Timestamp(datetime.date.today())]
+    suggested, shopping_list = st.session_state.suggested_reorders, st.session_state.shopping_list
+    due = due[[(mode, key) not in suggested and (mode, item) not in shopping_list
+               for key, item in zip(due.index, due["Item"])]]
+    if len(due):
+        suggested.update((mode, key) for key in due.index)
+        added = add_to_shopping_list(due.assign(Quantity=1)[["Item", "Category", "Quantity"]].itertuples(index=False),
+                                     mode)
+        if added:
+            st.success(f"Added {added} item{'s' if added != 1 else ''} you usually run out of by now.")
+    return suggestions[suggestions["Reorder By"] > pd.Timestamp(datetime.date.today())]
 
 # Sidebar Navigation
 with st.sidebar:
@@ -517,7 +204,7 @@ with st.sidebar:
     }
     if mode_map[mode] != st.session_state.mode:
         st.session_state.mode = mode_map[mode]
-        st.experimental_rerun()
+        st.rerun()
     
     st.markdown(f"""
     <p style="color: #2e7d32; font-weight: 600; font-size: 1rem;">
@@ -539,102 +226,61 @@ with st.sidebar:
         }
     )
 
-# Home Page
-if selected == "Home":
-    st.markdown('<h1 class="header-title">SmartExpire</h1>', unsafe_allow_html=True)
-    st.markdown(f'<p class="mission-statement">Sustainable management for your {st.session_state.mode.replace("_", " ")} items</p>', unsafe_allow_html=True)
-    
-    if st.session_state.grocery_data.empty:
-        st.session_state.grocery_data = load_sample_data(st.session_state.mode)
-    
-    if st.session_state.used_items.empty:
-        st.session_state.used_items = load_used_items()
-    
-    # Stats
-    df = st.session_state.grocery_data[st.session_state.grocery_data['Type'] == st.session_state.mode].copy()
-    df['Days Until Expiry'] = (df['Expiry Date'] - datetime.date.today()).dt.days
-    expiring_soon = len(df[df['Days Until Expiry'] <= (3 if st.session_state.mode == "grocery" else 7)])
-    expiring_moderate = len(df[(df['Days Until Expiry'] > 3) & (df['Days Until Expiry'] <= 7)] if st.session_state.mode == "grocery" else 
-                           df[(df['Days Until Expiry'] > 7) & (df['Days Until Expiry'] <= 30)])
-    total_items = len(df)
-    categories = df['Category'].nunique()
-    
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.markdown(f"""
-        <div class="stat-card">
-            <p class="stat-value">{total_items}</p>
-            <p class="stat-label">Total Items</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown(f"""
-        <div class="stat-card">
-            <p class="stat-value">{expiring_soon}</p>
-            <p class="stat-label">Expiring Soon</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown(f"""
-        <div class="stat-card">
-            <p class="stat-value">{categories}</p>
-            <p class="stat-label">Categories</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col4:
-        st.markdown(f"""
-        <div class="stat-card">
-            <p class="stat-value">${random.randint(20, 100)}</p>
-            <p class="stat-label">Estimated Savings</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    st.write("---")
-    
-    col1, col2 = st.columns([2, 1])
-    with col1:
-        st.markdown(f"""
-        ## Welcome to SmartExpire {st.session_state.mode.replace('_', ' ').capitalize()} Mode 🌱
-        Your sustainable {st.session_state.mode.replace('_', ' ')} management system.
-        ### Quick Actions
-        """)
-        action_cols = st.columns(3)
-        with action_cols[0]:
-            if st.button("➕ Add New Item"):
-                st.session_state.selected = "My List"
-        with action_cols[1]:
-            if st.button("⚠️ View Expiring Soon"):
-                st.session_state.selected = "My List"
-        with action_cols[2]:
-            if st.button("🍳 Get Recommendations" if st.session_state.mode == "grocery" else "💊 Schedule"):
-                st.session_state.selected = "Recommendations"
-    
-    with col2:
-        st.markdown("### Quick Scan")
-        st.markdown('<div class="ocr-upload">📸 Upload receipt or barcode</div>', unsafe_allow_html=True)
-        uploaded_file = st.file_uploader("Choose an image...", type=["jpg", "png", "jpeg"])
-        if uploaded_file:
-            image = Image.open(uploaded_file)
-            st.image(image, caption="Uploaded Image", use_column_width=True)
-            st.success("Processing image... Item added!")
+    if profiler is not NOT_PROFILING:
+        # Samples from earlier runs; this run is added when it finishes
+        with st.expander("🔬 Rerun profile"):
+            summary = profiler.summary()
+            if summary.empty:
+                st.caption("No runs recorded yet.")
+            else:
+                st.dataframe(summary.round(1))
+                metric = st.selectbox("Histogram", profiler.metrics(), key="profile_metric")
+                st.bar_chart(profiler.histogram(metric))
+            st.caption(f"Every run is also logged to {profiler.log_path}")
 
-# My List Page
-elif selected == "My List":
-    st.markdown(f'<h2 class="header-subtitle">My {st.session_state.mode.replace("_", " ").capitalize()} List</h2>', unsafe_allow_html=True)
-    
+# Buffered writes go out when the user moves to another page
+if store and st.session_state.get("page") != selected:
+    store.flush()
+    st.session_state.page = selected
+
+# Page sections. Each is a fragment: a click or edit inside one reruns only
+# that function, not the page config, styles, state setup and sidebar above.
+def rerun_fragment():
+    # A fragment-scoped rerun is only allowed while the fragment is running on
+    # its own; if it is part of a full run, rerun everything.
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+@st.fragment
+@profiler.timed("section:quick_scan")
+def quick_scan():
+    st.markdown("### Quick Scan")
+    st.markdown('<div class="ocr-upload">📸 Upload receipt or barcode</div>', unsafe_allow_html=True)
+    uploaded_file = st.file_uploader("Choose an image...", type=["jpg", "png", "jpeg"])
+    if uploaded_file:
+        image = Image.open(uploaded_file)
+        st.image(image, caption="Uploaded Image", use_column_width=True)
+        st.success("Processing image... Item added!")
+
+@st.fragment(key="my_list")
+@profiler.timed("section:my_list")
+def my_list_section():
     col1, col2 = st.columns([3, 1])
     
     with col2:
         st.markdown("### Used Items")
         st.markdown('<div class="used-items-sidebar">', unsafe_allow_html=True)
-        used_df = st.session_state.used_items[st.session_state.used_items['Type'] == st.session_state.mode]
+        with profiler.timer("inventory_filters"):
+            used_df = st.session_state.used_items.frame()
+            used_df = used_df[used_df['Type'] == st.session_state.mode]
         if used_df.empty:
             st.info("No items used yet.")
         else:
-            for _, row in used_df.iterrows():
+            if len(used_df) > USED_ITEMS_SHOWN:
+                st.caption(f"The {USED_ITEMS_SHOWN} most recent of {len(used_df)}")
+            for _, row in used_df.iloc[:-USED_ITEMS_SHOWN - 1:-1].iterrows():
                 st.markdown(f"""
                 <div class="card">
                     <strong>{row['Item']}</strong><br>
@@ -646,22 +292,16 @@ elif selected == "My List":
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col1:
-        df = st.session_state.grocery_data[st.session_state.grocery_data['Type'] == st.session_state.mode].copy()
-        df['Days Until Expiry'] = (df['Expiry Date'] - datetime.date.today()).dt.days
-        df = df.sort_values(by='Days Until Expiry')  # Sort by expiry date
+        with profiler.timer("inventory_filters"):
+            items = st.session_state.inventory.items(st.session_state.mode)
+            expiry_index = st.session_state.inventory.expiry_index(st.session_state.mode)
         
         with st.expander("➕ Add New Item", expanded=False):
             with st.form("add_item_form"):
                 col1, col2 = st.columns(2)
                 with col1:
                     item_name = st.text_input("Item Name")
-                    category = st.selectbox("Category", {
-                        "grocery": ["Dairy", "Meat", "Vegetable", "Fruit", "Bakery", "Other"],
-                        "pharmacy": ["Pain Relief", "Antibiotic", "Supplements", "Allergy", "Other"],
-                        "cosmetics": ["Skincare", "Haircare", "Makeup", "Other"],
-                        "cleaning": ["Kitchen", "Bathroom", "Laundry", "Other"],
-                        "pet_care": ["Pet Food", "Pet Supplies", "Other"]
-                    }[st.session_state.mode])
+                    category = st.selectbox("Category", reference.categories[st.session_state.mode])
                     quantity = st.number_input("Quantity", min_value=1, value=1)
                     purchase_date = st.date_input("Purchase Date", datetime.date.today())
                 with col2:
@@ -675,7 +315,7 @@ elif selected == "My List":
                     best_stored = st.text_input("Best Stored")
                 submitted = st.form_submit_button("Add Item")
                 if submitted:
-                    new_item = pd.DataFrame([{
+                    new_item = typed_inventory(pd.DataFrame([{
                         "Item": item_name,
                         "Category": category,
                         "Quantity": quantity,
@@ -689,128 +329,170 @@ elif selected == "My List":
                         "Best Before": best_before,
                         "Use By": use_by,
                         "Best Stored": best_stored
-                    }])
-                    st.session_state.grocery_data = pd.concat([st.session_state.grocery_data, new_item], ignore_index=True)
+                    }]))
+                    add_items(new_item)
                     st.success(f"{item_name} added!")
+
+        with st.expander("📦 Import / Export", expanded="bulk_import_report" in st.session_state):
+            st.file_uploader("Import a CSV or Parquet file (all modes; rows without a Type go to this mode)",
+                             type=FORMATS, key="bulk_import_file")
+            import_kind = st.radio("File contains", ["Items", "Used items"], horizontal=True, key="bulk_import_kind")
+            st.button("⬆️ Import", key="bulk_import", on_click=import_file, args=(import_kind,),
+                      disabled=st.session_state.bulk_import_file is None)
+            if "bulk_import_report" in st.session_state:
+                kind, report = st.session_state.pop("bulk_import_report")
+                st.success(f"Imported {report.imported} {kind.lower()}.")
+                if report.rejected:
+                    st.warning(f"Skipped {report.rejected} {'row' if report.rejected == 1 else 'rows'}:\n\n" + "\n".join(f"- {error}" for error in report.errors))
+            # Files are only built when a download button is clicked
+            export_cols = st.columns(4)
+            for col, (label, write, source, name, fmt) in zip(export_cols, [
+                ("⬇️ Items CSV", write_items, st.session_state.inventory, "items", "csv"),
+                ("⬇️ Items Parquet", write_items, st.session_state.inventory, "items", "parquet"),
+                ("⬇️ Used CSV", write_used_items, st.session_state.used_items, "used-items", "csv"),
+                ("⬇️ Used Parquet", write_used_items, st.session_state.used_items, "used-items", "parquet"),
+            ]):
+                with col:
+                    st.download_button(label, data=lambda write=write, source=source, fmt=fmt: export_file(write, source, fmt),
+                                       file_name=f"smartexpire-{name}.{fmt}", on_click="ignore", key=f"export_{name}_{fmt}",
+                                       mime="text/csv" if fmt == "csv" else "application/vnd.apache.parquet")
         
         st.markdown("### Your Items")
-        if df.empty:
+        if items.empty:
             st.info(f"No {st.session_state.mode.replace('_', ' ')} items added yet.")
         else:
-            for idx, row in df.iterrows():
-                days_left = row['Days Until Expiry']
-                expiry_class = "expiring-soon" if days_left < 1 else \
-                              "expiring-moderate" if days_left <= 2 else \
-                              "expiring-fine"
-                st.markdown(f"""
-                <div class="{expiry_class}">
-                    <strong>{row['Item']}</strong> ({row['Quantity']} {'' if row['Quantity'] == 1 else 'units'})<br>
-                    Category: {row['Category']} | Expires in: {days_left} days ({row['Expiry Date'].strftime('%Y-%m-%d')})<br>
-                    {'Opened' if row['Opened'] else 'Unopened'} | Storage: {row['Storage']}<br>
-                    {'Calories: ' + str(row['Calories']) + ' per serving<br>' if row['Calories'] > 0 else ''}
-                    Notes: {row['Notes'] or 'None'}<br>
-                """, unsafe_allow_html=True)
-                
-                col_btn1, col_btn2, col_btn3, col_btn4 = st.columns([1, 1, 1, 1])
-                with col_btn1:
-                    if st.button("ℹ️ Info", key=f"info_{idx}"):
-                        st.session_state.show_info[idx] = not st.session_state.show_info.get(idx, False)
-                with col_btn2:
-                    if st.button("🗑️ Used", key=f"used_{idx}"):
-                        used_item = pd.DataFrame([{
-                            "Item": row['Item'],
-                            "Category": row['Category'],
-                            "Quantity": row['Quantity'],
-                            "Used On": datetime.date.today(),
-                            "Used In": "Not specified",
-                            "Notes": row['Notes'],
-                            "Type": st.session_state.mode
-                        }])
-                        st.session_state.used_items = pd.concat([st.session_state.used_items, used_item], ignore_index=True)
-                        st.session_state.grocery_data = st.session_state.grocery_data.drop(idx)
-                        st.session_state.grocery_data = st.session_state.grocery_data.reset_index(drop=True)
-                        st.experimental_rerun()
-                with col_btn3:
-                    if st.button("➕ Add to Shopping List", key=f"shop_{idx}"):
-                        if row['Item'] not in st.session_state.shopping_list:
-                            st.session_state.shopping_list.append(row['Item'])
-                            st.success(f"{row['Item']} added to shopping list!")
-                with col_btn4:
-                    if st.button("🛒 Replace", key=f"replace_{idx}"):
-                        if row['Item'] not in st.session_state.shopping_list:
-                            st.session_state.shopping_list.append(row['Item'])
-                            st.success(f"{row['Item']} added to shopping list for replacement!")
-                
-                if st.session_state.show_info.get(idx, False):
-                    disposal = get_disposal_info(row['Item'], row['Category'], st.session_state.mode)
-                    st.markdown(f"""
-                    <div class="disposal-info">
-                        <strong>Item Information</strong><br>
-                        Best Before: {row['Best Before'].strftime('%Y-%m-%d')}<br>
-                        Use By: {row['Use By'].strftime('%Y-%m-%d')}<br>
-                        Best Stored: {row['Best Stored']}<br>
-                        Disposal Instructions: {disposal['instructions']}<br>
-                        Reason: {disposal['reason']}
-                    </div>
-                    """, unsafe_allow_html=True)
+            view_col, size_col, page_col = st.columns([2, 1, 1])
+            with view_col:
+                list_view = st.radio("View", ["Cards", "Table"], horizontal=True, key="list_view")
 
-# Recommendations Page
-elif selected == "Recommendations":
-    if st.session_state.mode == "grocery":
-        st.markdown('<h2 class="header-subtitle">Recipe Recommendations</h2>', unsafe_allow_html=True)
-        
-        # Search bar
-        st.markdown('<div class="search-bar">🔍 Search for an item to get recipe ideas</div>', unsafe_allow_html=True)
-        search_item = st.text_input("Search Item", placeholder="e.g., Eggs, Milk")
-        if search_item:
-            recipes = get_recipes([search_item], mode="grocery")
-            st.markdown(f"### Recipes for {search_item}")
-            if recipes:
-                for recipe in recipes:
-                    tag_class = {"Panic": "panic-tag", "Simple": "simple-tag", "Gourmet": "gourmet-tag"}.get(recipe['type'], "simple-tag")
-                    st.markdown(f"""
-                    <div class="recipe-card">
-                        <h3>{recipe['name']}</h3>
-                        <span class="{tag_class}">{recipe['type']}</span><br>
-                        <img src="{recipe['image']}" style="width:100%; border-radius:10px; margin:15px 0;">
-                        <p>{recipe['description']}</p>
-                        <p><strong>Ingredients:</strong> {recipe['ingredients']}</p>
-                        <p><strong>Time:</strong> {recipe['time']}</p>
-                        <p><strong>Instructions:</strong> {recipe['instructions']}</p>
-                    """, unsafe_allow_html=True)
-                    if st.button("❤️ Save Favorite", key=f"fav_{recipe['name']}"):
-                        if recipe not in st.session_state.favorite_recipes:
-                            st.session_state.favorite_recipes.append(recipe)
-                            st.success(f"{recipe['name']} saved to favorites!")
-                    st.markdown("</div>", unsafe_allow_html=True)
+            if list_view == "Table":
+                # One element for the whole list; actions apply to the selected rows.
+                # The key carries the mode's version, so a change to the list
+                # starts a fresh selection instead of reusing old row positions.
+                table = items.loc[expiry_index.ids, ["Item", "Category", "Quantity", "Expiry Date", "Opened", "Storage", "Notes"]]
+                table.insert(4, "Days Until Expiry", expiry_index.days_left())
+                version = st.session_state.inventory.versions[st.session_state.mode]
+                selection = st.dataframe(table, hide_index=True, on_select="rerun", selection_mode="multi-row",
+                                         key=f"list_table_{st.session_state.mode}_{version}")
+                selected_ids = expiry_index.ids[[row for row in selection.selection.rows if row < len(table)]]
+                if len(selected_ids):
+                    action_col1, action_col2 = st.columns(2)
+                    with action_col1:
+                        if st.button(f"🗑️ Mark {len(selected_ids)} Used", key="table_used"):
+                            mark_used(st.session_state.mode, selected_ids)
+                            rerun_fragment()
+                    with action_col2:
+                        if st.button(f"➕ Add {len(selected_ids)} to Shopping List", key="table_shop"):
+                            add_to_shopping_list(
+                                items.loc[selected_ids, ["Item", "Category", "Quantity"]].itertuples(index=False),
+                                st.session_state.mode)
+                            st.success("Selected items added to shopping list!")
             else:
-                st.info(f"No recipes found for {search_item}. Try another item!")
-        
-        # Favorite recipes
-        st.markdown("### Favorite Recipes")
-        st.markdown('<div class="favorite-recipes">', unsafe_allow_html=True)
-        if st.session_state.favorite_recipes:
-            for recipe in st.session_state.favorite_recipes:
-                tag_class = {"Panic": "panic-tag", "Simple": "simple-tag", "Gourmet": "gourmet-tag"}.get(recipe['type'], "simple-tag")
-                st.markdown(f"""
-                <div class="recipe-card">
-                    <h3>{recipe['name']}</h3>
-                    <span class="{tag_class}">{recipe['type']}</span><br>
-                    <p>{recipe['description']}</p>
-                    <button onclick="alert('Remove favorite coming soon!')">Remove Favorite</button>
-                </div>
-                """, unsafe_allow_html=True)
+                # Only the current page of cards is rendered, however long the list is
+                with size_col:
+                    per_page = st.selectbox("Per page", LIST_PAGE_SIZES, key="list_page_size")
+                page_count = max(1, -(-len(expiry_index) // per_page))
+                if st.session_state.get("list_page", 1) > page_count:
+                    st.session_state.list_page = page_count
+                with page_col:
+                    page = st.number_input("Page", min_value=1, max_value=page_count, key="list_page")
+                start = (page - 1) * per_page
+                page_ids = expiry_index.ids[start:start + per_page]
+                df = card_fields(items.loc[page_ids], expiry_index.days_left(start=start, stop=start + per_page),
+                                 st.session_state.mode)
+                st.caption(f"Showing {start + 1}-{start + len(page_ids)} of {len(expiry_index)} items")
+                for idx, row in df.iterrows():
+                    item_card(idx, row)
+
+# Runs as the import button's callback, so the list below already shows the
+# new rows. Chunks are saved and flushed one at a time, which keeps the
+# write-behind buffer to one chunk however large the file is.
+def import_file(kind):
+    uploaded = st.session_state.bulk_import_file
+    uploaded.seek(0)
+    report = ImportReport()
+    read = read_items if kind == "Items" else read_used_items
+    for chunk in read(uploaded, file_format(uploaded.name), st.session_state.mode, report):
+        if kind == "Items":
+            add_items(chunk)
         else:
-            st.info("No favorite recipes saved yet.")
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Expiring items
-        df = st.session_state.grocery_data[st.session_state.grocery_data['Type'] == "grocery"].copy()
-        df['Days Until Expiry'] = (df['Expiry Date'] - datetime.date.today()).dt.days
-        expiring_items = df[df['Days Until Expiry'] <= 3]['Item'].tolist()
-        if expiring_items:
-            st.markdown('<div class="panic-mode">⚠️ Items expiring soon! Use them now:</div>', unsafe_allow_html=True)
-            recipes = get_recipes(expiring_items, mode="grocery")
+            st.session_state.used_items.extend(chunk)
+            if store:
+                store.add_used_items(chunk.to_dict("records"))
+        if store:
+            store.flush()
+    st.session_state.bulk_import_report = (kind, report)
+
+def export_file(write, source, fmt):
+    buffer = io.BytesIO()
+    write(source, buffer, fmt)
+    return buffer.getvalue()
+
+# Removing a card changes the list around it, so its section reruns
+def mark_card_used(mode, idx):
+    mark_used(mode, [idx])
+    st.rerun(scope="my_list")
+
+# Info, shopping list and replace clicks only rerun their own card
+@st.fragment
+@profiler.timed("item_card")
+def item_card(idx, row):
+    expires = (f"Expires in: {row['Days Until Expiry']} days ({row['Expiry Text']})"
+               if pd.notna(row['Days Until Expiry']) else row['Expiry Text'])
+    st.markdown(f"""
+    <div class="{row['Urgency']}">
+        <strong>{row['Item']}</strong> ({row['Quantity']} {'' if row['Quantity'] == 1 else 'units'})<br>
+        Category: {row['Category']} | {expires}<br>
+        {'Opened' if row['Opened'] else 'Unopened'} | Storage: {row['Storage']}<br>
+        {'Calories: ' + str(row['Calories']) + ' per serving<br>' if row['Calories'] > 0 else ''}
+        Notes: {row['Notes'] or 'None'}<br>
+    """, unsafe_allow_html=True)
+
+    col_btn1, col_btn2, col_btn3, col_btn4 = st.columns([1, 1, 1, 1])
+    with col_btn1:
+        if st.button("ℹ️ Info", key=f"info_{idx}"):
+            st.session_state.show_info[idx] = not st.session_state.show_info.get(idx, False)
+    with col_btn2:
+        st.button("🗑️ Used", key=f"used_{idx}", on_click=mark_card_used, args=(st.session_state.mode, idx))
+    with col_btn3:
+        if st.button("➕ Add to Shopping List", key=f"shop_{idx}"):
+            if add_to_shopping_list([(row['Item'], row['Category'], row['Quantity'])], st.session_state.mode):
+                st.success(f"{row['Item']} added to shopping list!")
+            else:
+                st.success(f"{row['Item']} is already on the list; quantity updated.")
+    with col_btn4:
+        if st.button("🛒 Replace", key=f"replace_{idx}"):
+            if add_to_shopping_list([(row['Item'], row['Category'], row['Quantity'])], st.session_state.mode):
+                st.success(f"{row['Item']} added to shopping list for replacement!")
+            else:
+                st.success(f"{row['Item']} is already on the list; quantity updated.")
+
+    if st.session_state.show_info.get(idx, False):
+        with profiler.timer("disposal_info"):
+            disposal = reference.disposal_info(row['Category'], st.session_state.mode)
+        st.markdown(f"""
+        <div class="disposal-info">
+            <strong>Item Information</strong><br>
+            Best Before: {row['Best Before Text']}<br>
+            Use By: {row['Use By Text']}<br>
+            Best Stored: {row['Best Stored']}<br>
+            Disposal Instructions: {disposal['instructions']}<br>
+            Reason: {disposal['reason']}
+        </div>
+        """, unsafe_allow_html=True)
+
+@st.fragment
+@profiler.timed("section:recipe_recommendations")
+def recipe_recommendations():
+    # Search bar
+    st.markdown('<div class="search-bar">🔍 Search for an item to get recipe ideas</div>', unsafe_allow_html=True)
+    search_item = st.text_input("Search Item", placeholder="e.g., Eggs, Milk")
+    if search_item:
+        # Typo-tolerant match on titles and ingredients; generic ideas if nothing is close
+        recipes = [recipe for recipe, _ in reference.catalog.fuzzy_search(search_item, k=SEARCH_RESULTS)] or \
+            get_recipes([search_item], mode="grocery")
+        st.markdown(f"### Recipes for {search_item}")
+        if recipes:
             for recipe in recipes:
                 tag_class = {"Panic": "panic-tag", "Simple": "simple-tag", "Gourmet": "gourmet-tag"}.get(recipe['type'], "simple-tag")
                 st.markdown(f"""
@@ -823,103 +505,221 @@ elif selected == "Recommendations":
                     <p><strong>Time:</strong> {recipe['time']}</p>
                     <p><strong>Instructions:</strong> {recipe['instructions']}</p>
                 """, unsafe_allow_html=True)
-                if st.button("❤️ Save Favorite", key=f"fav_expiring_{recipe['name']}"):
+                if st.button("❤️ Save Favorite", key=f"fav_{recipe['name']}"):
                     if recipe not in st.session_state.favorite_recipes:
                         st.session_state.favorite_recipes.append(recipe)
                         st.success(f"{recipe['name']} saved to favorites!")
                 st.markdown("</div>", unsafe_allow_html=True)
         else:
-            st.info("No items expiring soon.")
-    
+            st.info(f"No recipes found for {search_item}. Try another item!")
+    
+    # Favorite recipes
+    st.markdown("### Favorite Recipes")
+    st.markdown('<div class="favorite-recipes">', unsafe_allow_html=True)
+    if st.session_state.favorite_recipes:
+        for recipe in st.session_state.favorite_recipes:
+            tag_class = {"Panic": "panic-tag", "Simple": "simple-tag", "Gourmet": "gourmet-tag"}.get(recipe['type'], "simple-tag")
+            st.markdown(f"""
+            <div class="recipe-card">
+                <h3>{recipe['name']}</h3>
+                <span class="{tag_class}">{recipe['type']}</span><br>
+                <p>{recipe['description']}</p>
+                <button onclick="alert('Remove favorite coming soon!')">Remove Favorite</button>
+            </div>
+            """, unsafe_allow_html=True)
     else:
-        st.markdown(f'<h2 class="header-subtitle">{st.session_state.mode.replace("_", " ").capitalize()} Schedule</h2>', unsafe_allow_html=True)
-        with st.form(f"{st.session_state.mode}_schedule_form"):
-            item_name = st.text_input("Item Name")
-            instructions = st.text_input("Usage Instructions")
-            times = st.multiselect("Times of Day", ["Morning", "Afternoon", "Evening", "Night"])
-            days = st.multiselect("Days", ["Daily", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])
-            submitted = st.form_submit_button("Add to Schedule")
-            if submitted:
-                st.session_state.medication_schedule.append({
-                    "Item": item_name,
-                    "Instructions": instructions,
-                    "Times": times,
-                    "Days": days,
-                    "Type": st.session_state.mode
-                })
+        st.info("No favorite recipes saved yet.")
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Expiring items
+    with profiler.timer("inventory_filters"):
+        expiry_index = st.session_state.inventory.expiry_index("grocery")
+        expiring_ids = expiry_index.ids_within(3)
+        expiring_items = st.session_state.inventory.items("grocery").loc[expiring_ids, 'Item'].tolist()
+    if expiring_items:
+        st.markdown('<div class="panic-mode">⚠️ Items expiring soon! Use them now:</div>', unsafe_allow_html=True)
+        # Rank recipes by how many expiring items they use, soonest-expiring first
+        ranked = reference.catalog.rank_for_items(expiring_items, expiry_index.days_left(stop=len(expiring_ids)), k=EXPIRING_RECIPES)
+        if not ranked:
+            ranked = [(recipe, expiring_items[:1]) for recipe in get_recipes(expiring_items[:1], mode="grocery")]
+        for recipe, uses in ranked:
+            tag_class = {"Panic": "panic-tag", "Simple": "simple-tag", "Gourmet": "gourmet-tag"}.get(recipe['type'], "simple-tag")
+            st.markdown(f"""
+            <div class="recipe-card">
+                <h3>{recipe['name']}</h3>
+                <span class="{tag_class}">{recipe['type']}</span><br>
+                <img src="{recipe['image']}" style="width:100%; border-radius:10px; margin:15px 0;">
+                <p>{recipe['description']}</p>
+                <p><strong>Ingredients:</strong> {recipe['ingredients']}</p>
+                <p><strong>Uses up:</strong> {', '.join(uses)}</p>
+                <p><strong>Time:</strong> {recipe['time']}</p>
+                <p><strong>Instructions:</strong> {recipe['instructions']}</p>
+            """, unsafe_allow_html=True)
+            if st.button("❤️ Save Favorite", key=f"fav_expiring_{recipe['name']}"):
+                if recipe not in st.session_state.favorite_recipes:
+                    st.session_state.favorite_recipes.append(recipe)
+                    st.success(f"{recipe['name']} saved to favorites!")
+            st.markdown("</div>", unsafe_allow_html=True)
+    else:
+        st.info("No items expiring soon.")
+
+SCHEDULE_WINDOWS = [1, 2, 4, 8, 12, 24, 48]
+
+@st.fragment
+@profiler.timed("section:usage_schedule")
+def usage_schedule():
+    mode = st.session_state.mode
+    schedule = st.session_state.medication_schedule
+    with st.form(f"{mode}_schedule_form"):
+        item_name = st.text_input("Item Name")
+        instructions = st.text_input("Usage Instructions")
+        times = st.multiselect("Times of Day", list(TIMES_OF_DAY))
+        days = st.multiselect("Days", DAY_OPTIONS)
+        submitted = st.form_submit_button("Add to Schedule")
+        if submitted:
+            try:
+                schedule.add(item_name, instructions, times, days, mode)
                 st.success(f"{item_name} added to schedule!")
-        
-        if st.session_state.medication_schedule:
-            st.markdown(f"### Your {st.session_state.mode.replace('_', ' ')} Schedule")
-            for item in st.session_state.medication_schedule:
-                if item['Type'] == st.session_state.mode:
-                    st.markdown(f"""
-                    <div class="card">
-                        <strong>{item['Item']}</strong><br>
-                        Instructions: {item['Instructions']}<br>
-                        Times: {', '.join(item['Times'])}<br>
-                        Days: {', '.join(item['Days'])}<br>
-                        <button onclick="alert('Edit/Remove coming soon!')">Edit/Remove</button>
-                    </div>
-                    """, unsafe_allow_html=True)
-        else:
-            st.info(f"No {st.session_state.mode.replace('_', ' ')} items scheduled yet.")
+            except ValueError as e:
+                st.error(str(e))
 
-# My Hub Page
-elif selected == "My Hub":
-    st.markdown(f'<h2 class="header-subtitle">My {st.session_state.mode.replace("_", " ").capitalize()} Hub</h2>', unsafe_allow_html=True)
-    
-    st.markdown("### SmartCard")
-    st.markdown(f"""
-    <div class="smartcard">
-        <h3>SmartExpire SmartCard</h3>
-        <p>Scan this card instead of using paper receipts!</p>
-        <img src="https://via.placeholder.com/300x150.png?text=SmartCard" style="width:100%; border-radius:10px; margin:15px 0;">
-        <p>Card Number: SMRT-{random.randint(1000, 9999)}</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
+    entries = schedule.entries(mode)
+    if entries:
+        st.markdown("### Due Soon")
+        hours = st.select_slider("Due in the next", SCHEDULE_WINDOWS, value=8, format_func=lambda h: f"{h} hours",
+                                 key=f"{mode}_schedule_window")
+        doses = schedule.due(mode, datetime.datetime.now(), hours)
+        for when, entry in doses:
+            st.markdown(f"**{when:%a %H:%M}** · {entry['Item']} · {entry['Instructions']}")
+        if not doses:
+            st.caption(f"Nothing due in the next {hours} hours.")
+
+        st.markdown(f"### Your {mode.replace('_', ' ')} Schedule")
+        for entry_id, item in entries.items():
+            st.markdown(f"""
+            <div class="card">
+                <strong>{item['Item']}</strong><br>
+                Instructions: {item['Instructions']}<br>
+                Times: {', '.join(item['Times']) or 'As needed'}<br>
+                Days: {', '.join(item['Days']) or 'Daily'}<br>
+            </div>
+            """, unsafe_allow_html=True)
+            st.button("Remove", key=f"schedule_remove_{entry_id}", on_click=schedule.remove, args=(mode, entry_id))
+    else:
+        st.info(f"No {mode.replace('_', ' ')} items scheduled yet.")
+
+# Grouped by category in one pass over the list; ticked items are checked
+# off together when the form is submitted
+@st.fragment
+@profiler.timed("section:shopping_list")
+def shopping_list_section():
+    mode = st.session_state.mode
+    st.markdown("### Shopping List")
+    with profiler.timer("reorder_suggestions"):
+        upcoming = add_reorders(mode)
+    if len(upcoming):
+        with st.expander(f"🔮 {len(upcoming)} more to reorder this week"):
+            st.dataframe(upcoming.drop(columns="Runs Out"), hide_index=True,
+                         column_config={"Reorder By": st.column_config.DateColumn("Reorder By")})
+    groups = st.session_state.shopping_list.by_category(mode)
+    if groups:
+        with st.form(f"{mode}_shopping_list_form"):
+            for category, entries in groups.items():
+                st.markdown(f"**{category}**")
+                for entry in entries:
+                    st.checkbox(f"{entry['Item']} × {entry['Quantity']}", key=f"shop_check_{entry['id']}")
+            st.form_submit_button("✅ Check Off Selected", on_click=check_off_shopping, args=(mode,))
+    else:
+        st.info("Your shopping list is empty.")
+
+# Shown while a receipt's OCR job runs. Only this notice reruns while the
+# job is polled; once it has finished (or failed) the page reruns, so the
+# receipts section shows the extracted items or the error.
+@st.fragment(run_every=OCR_POLL_SECONDS)
+def ocr_pending(digest):
+    try:
+        done = get_ocr_service().result(digest, timeout=0) is not None
+    except Exception:
+        done = True
+    if done:
+        st.rerun()
+    st.info("⏳ Processing receipt... keep using the app, the text will appear here when it's ready.")
+
+@st.fragment
+@profiler.timed("section:receipts_section")
+def receipts_section():
     st.markdown("### Receipt Scanner")
     st.markdown('<div class="ocr-upload">📸 Upload a receipt to extract items</div>', unsafe_allow_html=True)
     receipt_file = st.file_uploader("Choose a receipt image...", type=["jpg", "png", "jpeg"], key="receipt_upload")
     if receipt_file:
-        image = Image.open(receipt_file)
-        st.image(image, caption="Uploaded Receipt", use_column_width=True)
-        # Simulate OCR processing
-        text = pytesseract.image_to_string(image)
-        st.session_state.past_receipts.append({
-            "date": datetime.date.today(),
-            "text": text,
-            "image": receipt_file.getvalue()
-        })
-        st.success("Receipt processed! Items extracted and saved.")
+        receipt_bytes = receipt_file.getvalue()
+        digest = receipt_digest(receipt_bytes)
+        receipt, _ = st.session_state.past_receipts.ingest(receipt_bytes, digest, name=receipt_file.name)
+        st.image(receipt["thumbnail"], caption="Uploaded Receipt")
+        ocr = get_ocr_service()
+        try:
+            with profiler.timer("receipt_ocr"):
+                ocr.submit(receipt_bytes, digest)
+                text = ocr.result(digest, timeout=0)
+        except Exception as e:
+            st.error(f"Could not read this receipt: {e}")
+        else:
+            if text is None:
+                ocr_pending(digest)
+            else:
+                st.session_state.past_receipts.set_text(digest, text)
+                if receipt["items"] is None:
+                    receipt["items"] = list(parse_receipt_lines(text))
+                if receipt["imported"]:
+                    st.success("Receipt processed! Items extracted and saved.")
+                elif receipt["items"]:
+                    st.markdown(f"**{len(receipt['items'])} items found.** Check them before adding to your list:")
+                    extracted = st.data_editor(
+                        receipt_items(receipt["items"], st.session_state.mode)[["Item", "Category", "Quantity", "Expiry Date"]],
+                        column_config={"Category": st.column_config.SelectboxColumn(
+                            "Category", options=reference.categories[st.session_state.mode], required=True)},
+                        num_rows="dynamic", hide_index=True, key=f"receipt_items_{digest}")
+                    if st.button(f"➕ Add {len(extracted)} items to My List", key=f"receipt_import_{digest}"):
+                        new_items = receipt_items(extracted.dropna(subset=["Item"]).to_dict("records"), st.session_state.mode)
+                        add_items(new_items)
+                        st.session_state.prices.add(receipt["items"])
+                        receipt["imported"] = True
+                        if store:
+                            store.save_receipts([receipt])
+                        st.success(f"Receipt processed! {len(new_items)} items extracted and saved.")
+                else:
+                    st.warning("Receipt processed, but no item lines were recognised.")
     
     st.markdown("### Past Receipts")
-    if st.session_state.past_receipts:
-        for idx, receipt in enumerate(st.session_state.past_receipts):
+    past_receipts = st.session_state.past_receipts
+    if len(past_receipts):
+        receipt_page = 0
+        if past_receipts.page_count(RECEIPTS_PER_PAGE) > 1:
+            receipt_page = st.number_input("Page", min_value=1, max_value=past_receipts.page_count(RECEIPTS_PER_PAGE),
+                                           value=1, key="receipt_page") - 1
+        for receipt in past_receipts.page(receipt_page, RECEIPTS_PER_PAGE):
+            thumbnail = ""
+            if receipt['thumbnail']:
+                thumbnail = (f'<img src="data:image/jpeg;base64,{base64.b64encode(receipt["thumbnail"]).decode()}" '
+                             'style="max-width:120px; border-radius:8px; margin:10px 0;"><br>')
+            if receipt['text'] is None and receipt['imported']:
+                receipt['text'] = get_ocr_service().cache.get(receipt['digest'])
             st.markdown(f"""
             <div class="receipt-card">
-                <strong>Receipt {idx + 1}</strong><br>
+                <strong>Receipt {receipt['number']}</strong><br>
+                {thumbnail}
                 Date: {receipt['date'].strftime('%Y-%m-%d')}<br>
-                Extracted Text: <pre>{receipt['text'][:100]}...</pre><br>
+                Extracted Text: <pre>{(receipt['text'] or 'Processing...')[:100]}...</pre><br>
                 <button onclick="alert('View/Delete coming soon!')">View/Delete</button>
             </div>
             """, unsafe_allow_html=True)
     else:
         st.info("No receipts uploaded yet.")
-    
-    st.markdown("### Shopping List")
-    if st.session_state.shopping_list:
-        for item in st.session_state.shopping_list:
-            st.markdown(f"""
-            <div class="card">
-                <strong>{item}</strong><br>
-                <button onclick="alert('Remove coming soon!')">Remove from List</button>
-            </div>
-            """, unsafe_allow_html=True)
-    else:
-        st.info("Your shopping list is empty.")
-    
+
+
+@st.fragment
+@profiler.timed("section:barcode_cards_section")
+def barcode_cards_section():
     st.markdown("### My Barcode Cards")
     for card in st.session_state.barcode_cards:
         st.markdown(f"""
@@ -943,4 +743,132 @@ elif selected == "My Hub":
                     "number": card_number,
                     "image": card_image
                 })
-                st.success(f"{card_name} added!")
\ No newline at end of file
+                st.success(f"{card_name} added!")
+
+# Home Page
+if selected == "Home":
+    st.markdown('<h1 class="header-title">SmartExpire</h1>', unsafe_allow_html=True)
+    st.markdown(f'<p class="mission-statement">Sustainable management for your {st.session_state.mode.replace("_", " ")} items</p>', unsafe_allow_html=True)
+    
+    # Only the current mode is checked, so other modes stay unloaded
+    if st.session_state.inventory.items(st.session_state.mode).empty:
+        st.session_state.inventory.add(reference.sample_items(st.session_state.mode))
+    
+    if st.session_state.used_items.empty:
+        st.session_state.used_items = UsedItemsLog(reference.sample_used_items())
+    
+    # Stats
+    with profiler.timer("inventory_filters"):
+        df = st.session_state.inventory.items(st.session_state.mode)
+        expiry_index = st.session_state.inventory.expiry_index(st.session_state.mode)
+        urgency = expiry_index.urgency_counts(st.session_state.mode)
+        expiring_soon = urgency["expiring-soon"]
+        total_items = len(df)
+        categories = df['Category'].nunique()
+        stats = st.session_state.used_items.stats
+        savings = stats.summary(st.session_state.mode)["recovered"]
+        recent = stats.summary(st.session_state.mode, weeks=STATS_WEEKS)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.markdown(f"""
+        <div class="stat-card">
+            <p class="stat-value">{total_items}</p>
+            <p class="stat-label">Total Items</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="stat-card">
+            <p class="stat-value">{expiring_soon}</p>
+            <p class="stat-label">Expiring Soon</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="stat-card">
+            <p class="stat-value">{categories}</p>
+            <p class="stat-label">Categories</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown(f"""
+        <div class="stat-card">
+            <p class="stat-value">${savings:,.2f}</p>
+            <p class="stat-label">Estimated Savings</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    st.markdown(f"### Last {STATS_WEEKS} Weeks")
+    usage_col, waste_col = st.columns([3, 1])
+    with usage_col:
+        st.bar_chart(stats.weekly_usage(st.session_state.mode, reference.categories[st.session_state.mode],
+                                        weeks=STATS_WEEKS), y_label="Quantity used")
+    with waste_col:
+        st.metric("Items Used", recent["used"])
+        st.metric("Used Past Expiry", "–" if recent["waste_rate"] is None else f"{recent['waste_rate']:.0%}")
+        st.metric("Spend Recovered", f"${recent['recovered']:,.2f}")
+    
+    st.write("---")
+    
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.markdown(f"""
+        ## Welcome to SmartExpire {st.session_state.mode.replace('_', ' ').capitalize()} Mode 🌱
+        Your sustainable {st.session_state.mode.replace('_', ' ')} management system.
+        ### Quick Actions
+        """)
+        action_cols = st.columns(3)
+        with action_cols[0]:
+            if st.button("➕ Add New Item"):
+                st.session_state.selected = "My List"
+        with action_cols[1]:
+            if st.button("⚠️ View Expiring Soon"):
+                st.session_state.selected = "My List"
+        with action_cols[2]:
+            if st.button("🍳 Get Recommendations" if st.session_state.mode == "grocery" else "💊 Schedule"):
+                st.session_state.selected = "Recommendations"
+    
+    with col2:
+        quick_scan()
+
+# My List Page
+elif selected == "My List":
+    st.markdown(f'<h2 class="header-subtitle">My {st.session_state.mode.replace("_", " ").capitalize()} List</h2>', unsafe_allow_html=True)
+    
+    my_list_section()
+
+# Recommendations Page
+elif selected == "Recommendations":
+    if st.session_state.mode == "grocery":
+        st.markdown('<h2 class="header-subtitle">Recipe Recommendations</h2>', unsafe_allow_html=True)
+        recipe_recommendations()
+    
+    else:
+        st.markdown(f'<h2 class="header-subtitle">{st.session_state.mode.replace("_", " ").capitalize()} Schedule</h2>', unsafe_allow_html=True)
+        usage_schedule()
+
+# My Hub Page
+elif selected == "My Hub":
+    st.markdown(f'<h2 class="header-subtitle">My {st.session_state.mode.replace("_", " ").capitalize()} Hub</h2>', unsafe_allow_html=True)
+    
+    st.markdown("### SmartCard")
+    st.markdown(f"""
+    <div class="smartcard">
+        <h3>SmartExpire SmartCard</h3>
+        <p>Scan this card instead of using paper receipts!</p>
+        <img src="https://via.placeholder.com/300x150.png?text=SmartCard" style="width:100%; border-radius:10px; margin:15px 0;">
+        <p>Card Number: SMRT-{random.randint(1000, 9999)}</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    receipts_section()
+    
+    shopping_list_section()
+    
+    barcode_cards_section()
+
+profiler.finish_run(page=selected)
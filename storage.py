@@ -0,0 +1,504 @@
+"""Optional database persistence for the tables defined in schema.sql.
+
+Enabled by setting SMARTEXPIRE_DATABASE_URL to ``sqlite:///path/to.db`` (a
+local stand-in that creates the tables itself) or a ``postgresql://`` URL
+(needs psycopg2). Session state stays the working copy; this module only
+loads it lazily and writes changes back in multi-row statements.
+"""
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager, suppress
+
+import pandas as pd
+
+from inventory import COLUMNS, USED_COLUMNS, typed_inventory, typed_used_items
+
+DATABASE_URL = os.environ.get("SMARTEXPIRE_DATABASE_URL")
+POOL_SIZE = int(os.environ.get("SMARTEXPIRE_DB_POOL_SIZE", 5))
+# The Streamlit app has no sign-in, so one household per deployment
+USER_ID = os.environ.get("SMARTEXPIRE_USER_ID", "00000000-0000-0000-0000-000000000001")
+# Write-behind: how long changes may sit in memory before they're flushed,
+# and the local journal that keeps them if the process dies first
+FLUSH_INTERVAL = float(os.environ.get("SMARTEXPIRE_FLUSH_INTERVAL", 2.0))
+JOURNAL_PATH = os.environ.get(
+    "SMARTEXPIRE_JOURNAL",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".storage-journal.jsonl"),
+)
+
+logger = logging.getLogger(__name__)
+
+# schema.sql's tables without the Supabase auth references and policies
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    expiry_date DATE,
+    opened BOOLEAN DEFAULT 0,
+    quantity INTEGER DEFAULT 1,
+    unit TEXT,
+    image_url TEXT,
+    mode TEXT DEFAULT 'grocery',
+    user_id TEXT NOT NULL,
+    foodSubcategory TEXT
+);
+CREATE TABLE IF NOT EXISTS item_info (
+    item_id TEXT PRIMARY KEY REFERENCES items(id) ON DELETE CASCADE,
+    best_before DATE,
+    use_by DATE,
+    best_stored TEXT,
+    nutritional_info TEXT,
+    ingredients TEXT,
+    additional TEXT
+);
+CREATE TABLE IF NOT EXISTS receipts (
+    id TEXT PRIMARY KEY,
+    date TIMESTAMP,
+    store TEXT,
+    total NUMERIC,
+    image_url TEXT,
+    user_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shopping_list (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    quantity INTEGER DEFAULT 1,
+    unit TEXT NOT NULL,
+    category TEXT NOT NULL,
+    added TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    image_url TEXT,
+    mode TEXT DEFAULT 'grocery',
+    user_id TEXT NOT NULL,
+    foodSubcategory TEXT
+);
+CREATE TABLE IF NOT EXISTS used_items (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    quantity INTEGER DEFAULT 1,
+    unit TEXT NOT NULL,
+    used_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    image_url TEXT,
+    added_to_shopping_list BOOLEAN DEFAULT 0,
+    mode TEXT DEFAULT 'grocery',
+    user_id TEXT NOT NULL,
+    foodSubcategory TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_items_user_id ON items (user_id, mode);
+CREATE INDEX IF NOT EXISTS idx_items_user_id_id ON items (user_id, id);
+CREATE INDEX IF NOT EXISTS idx_receipts_user_id ON receipts (user_id);
+CREATE INDEX IF NOT EXISTS idx_shopping_list_user_id ON shopping_list (user_id);
+CREATE INDEX IF NOT EXISTS idx_used_items_user_id ON used_items (user_id);
+"""
+
+
+class ConnectionPool:
+    """Fixed-size pool of DB-API connections shared by every session.
+
+    A slot is held for each connection in use; a connection is only made
+    when no idle one is left, and one that fails to connect or to roll back
+    gives its slot back, so a new one is made in its place.
+    """
+
+    def __init__(self, connect, size=POOL_SIZE):
+        self._connect = connect
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                with suppress(Exception):
+                    conn.close()
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._idle.put(conn)
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def connect(url, size=POOL_SIZE):
+    """Return (pool, placeholder) for a database URL."""
+    if url.startswith("sqlite:///"):
+        path = url[len("sqlite:///"):]
+        with sqlite3.connect(path) as conn:
+            conn.executescript(SQLITE_SCHEMA)
+        return ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False), size), "?"
+    if url.startswith(("postgres://", "postgresql://")):
+        try:
+            import psycopg2
+        except ImportError as e:
+            raise ImportError("Postgres persistence needs psycopg2: pip install psycopg2-binary") from e
+        return ConnectionPool(lambda: psycopg2.connect(url), size), "%s"
+    raise ValueError(f"Unsupported database URL: {url}")
+
+
+def _iso(value):
+    if value is None or pd.isna(value):
+        return None
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def _iso_date(value):
+    return None if value is None or pd.isna(value) else pd.Timestamp(value).date().isoformat()
+
+
+def _dates(values):
+    return pd.to_datetime(pd.Series(values, dtype=object), errors="coerce")
+
+
+# Multi-row upserts, keyed on each table's primary key so a batch can be
+# replayed safely. Rows are the parameter tuples built by Repository.*_rows.
+UPSERT_SQL = {
+    "items": "INSERT INTO items (id, name, category, expiry_date, opened, quantity, mode, user_id) "
+             "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET name = excluded.name, "
+             "category = excluded.category, expiry_date = excluded.expiry_date, opened = excluded.opened, "
+             "quantity = excluded.quantity, mode = excluded.mode",
+    "item_info": "INSERT INTO item_info (item_id, best_before, use_by, best_stored, nutritional_info, additional) "
+                 "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (item_id) DO UPDATE SET best_before = excluded.best_before, "
+                 "use_by = excluded.use_by, best_stored = excluded.best_stored, "
+                 "nutritional_info = excluded.nutritional_info, additional = excluded.additional",
+    "used_items": "INSERT INTO used_items (id, name, category, quantity, unit, used_date, mode, user_id) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO NOTHING",
+    "shopping_list": "INSERT INTO shopping_list (id, name, quantity, unit, category, added, mode, user_id) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET name = excluded.name, "
+                     "quantity = excluded.quantity, unit = excluded.unit, category = excluded.category",
+    "receipts": "INSERT INTO receipts (id, date, total, image_url, user_id) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET total = excluded.total",
+}
+# Tables are written in this order, so item_info rows follow their items
+TABLES = list(UPSERT_SQL)
+
+
+class Repository:
+    """Reads and writes one household's rows in the schema.sql tables."""
+
+    def __init__(self, pool, placeholder="?", user_id=USER_ID):
+        self.pool = pool
+        self.user_id = user_id
+        self._p = placeholder
+
+    def _sql(self, sql):
+        return sql.replace("?", self._p)
+
+    def _query(self, sql, params=()):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._sql(sql), params)
+            return cursor.fetchall()
+
+    def write(self, upserts=None, deleted_items=(), deleted_shopping=()):
+        """Apply a batch in one transaction: {table: rows} upserts, then item
+        and shopping list deletes."""
+        upserts = upserts or {}
+        deletes = [(item_id, self.user_id) for item_id in deleted_items]
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            for table in TABLES:
+                if upserts.get(table):
+                    cursor.executemany(self._sql(UPSERT_SQL[table]), upserts[table])
+            if deletes:
+                cursor.executemany(self._sql("DELETE FROM item_info WHERE item_id IN "
+                                             "(SELECT id FROM items WHERE id = ? AND user_id = ?)"), deletes)
+                cursor.executemany(self._sql("DELETE FROM items WHERE id = ? AND user_id = ?"), deletes)
+            if deleted_shopping:
+                cursor.executemany(self._sql("DELETE FROM shopping_list WHERE id = ? AND user_id = ?"),
+                                   [(row_id, self.user_id) for row_id in deleted_shopping])
+
+    # Inventory: items + item_info, one mode at a time
+    def load_items(self, mode):
+        rows = self._query(
+            "SELECT i.id, i.name, i.category, i.quantity, i.expiry_date, i.opened, "
+            "f.best_before, f.use_by, f.best_stored, f.nutritional_info, f.additional "
+            "FROM items i LEFT JOIN item_info f ON f.item_id = i.id "
+            "WHERE i.user_id = ? AND i.mode = ?", (self.user_id, mode))
+        extra = [json.loads(row[10] or "{}") for row in rows]
+        df = pd.DataFrame({
+            "Item": [row[1] for row in rows],
+            "Category": [row[2] for row in rows],
+            "Quantity": [row[3] for row in rows],
+            "Purchase Date": _dates([e.get("purchase_date") for e in extra]),
+            "Expiry Date": _dates([row[4] for row in rows]),
+            "Opened": [bool(row[5]) for row in rows],
+            "Calories": pd.to_numeric(pd.Series([row[9] for row in rows], dtype=object), errors="coerce"),
+            "Storage": [e.get("storage", "") for e in extra],
+            "Notes": [e.get("notes", "") for e in extra],
+            "Type": mode,
+            "Best Before": _dates([row[6] for row in rows]),
+            "Use By": _dates([row[7] for row in rows]),
+            "Best Stored": [row[8] for row in rows],
+        }, columns=COLUMNS)
+        return typed_inventory(df.set_axis(pd.Index([str(row[0]) for row in rows], name="ID")))
+
+    def item_rows(self, df):
+        items, info = [], []
+        for item_id, row in zip(df.index, df.itertuples(index=False)):
+            row = dict(zip(COLUMNS, row))
+            items.append((item_id, row["Item"], row["Category"], _iso_date(row["Expiry Date"]), bool(row["Opened"]),
+                          int(row["Quantity"]), row["Type"], self.user_id))
+            info.append((item_id, _iso_date(row["Best Before"]), _iso_date(row["Use By"]), row["Best Stored"],
+                         str(row["Calories"]), json.dumps({"purchase_date": _iso_date(row["Purchase Date"]),
+                                                           "storage": row["Storage"], "notes": row["Notes"]})))
+        return {"items": items, "item_info": info}
+
+    def save_items(self, df):
+        self.write(self.item_rows(df))
+
+    def delete_items(self, ids):
+        self.write(deleted_items=ids)
+
+    # Used items history (schema.sql keeps no "Used In"/"Notes")
+    def load_used_items(self):
+        rows = self._query("SELECT name, category, quantity, used_date, mode FROM used_items "
+                           "WHERE user_id = ? ORDER BY used_date", (self.user_id,))
+        return typed_used_items(pd.DataFrame({
+            "Item": [row[0] for row in rows],
+            "Category": [row[1] for row in rows],
+            "Quantity": [row[2] for row in rows],
+            "Used On": _dates([row[3] for row in rows]).dt.normalize(),
+            "Used In": "Not specified",
+            "Notes": "",
+            "Type": [row[4] for row in rows],
+        }, columns=USED_COLUMNS))
+
+    def used_rows(self, records):
+        return {"used_items": [
+            (str(uuid.uuid4()), r["Item"], r["Category"], int(r["Quantity"]),
+             "unit" if r["Quantity"] == 1 else "units", _iso(r["Used On"]), r["Type"], self.user_id)
+            for r in records]}
+
+    def add_used_items(self, records):
+        self.write(self.used_rows(records))
+
+    # Shopping list, as rows for shopping.ShoppingList
+    def load_shopping_list(self):
+        return [{"id": row[0], "Item": row[1], "Quantity": row[2], "Unit": row[3], "Category": row[4], "Type": row[5]}
+                for row in self._query("SELECT id, name, quantity, unit, category, mode FROM shopping_list "
+                                       "WHERE user_id = ? ORDER BY added", (self.user_id,))]
+
+    def shopping_rows(self, entries):
+        now = _iso(datetime.datetime.now(datetime.timezone.utc))
+        return {"shopping_list": [(e["id"], e["Item"], e["Quantity"], e["Unit"], e["Category"], now, e["Type"],
+                                   self.user_id) for e in entries]}
+
+    # A saved entry replaces any duplicate rows merged into it on load
+    def save_shopping_items(self, entries):
+        self.write(self.shopping_rows(entries), deleted_shopping=[i for e in entries for i in e["ids"][1:]])
+
+    def delete_shopping_items(self, entries):
+        self.write(deleted_shopping=[i for e in entries for i in e["ids"]])
+
+    # Receipts; the original image path doubles as the OCR cache key
+    def load_receipts(self):
+        return [{"date": pd.Timestamp(row[0]).date(), "total": row[1], "original": row[2]}
+                for row in self._query("SELECT date, total, image_url FROM receipts "
+                                       "WHERE user_id = ? ORDER BY date", (self.user_id,))]
+
+    def receipt_rows(self, entries):
+        return {"receipts": [
+            (str(uuid.UUID(e["digest"][:32])), _iso(e["date"]),
+             round(sum(i["Price"] for i in e["items"]), 2) if e.get("items") else None,
+             e["original"], self.user_id) for e in entries]}
+
+    def save_receipts(self, entries):
+        self.write(self.receipt_rows(entries))
+
+
+class UnitOfWork:
+    """Write-behind buffer in front of a Repository.
+
+    Handlers record changes here instead of hitting the database: each call
+    appends one line to a local journal and merges the rows into per-table
+    dirty maps keyed by primary key, so repeated writes to a row coalesce
+    and an add followed by a delete cancels out. Everything is written in
+    one transaction by `flush`, which runs on a timer, when the page
+    changes, before any load (so reads see earlier writes) and at exit.
+    Journals left behind by a crash are replayed on start-up.
+    """
+
+    def __init__(self, repository, journal_path=JOURNAL_PATH, flush_interval=FLUSH_INTERVAL):
+        self.repository = repository
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._reset()
+        for path in (self._flushing_path, journal_path):
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            self._merge(json.loads(line))
+        self._journal = open(journal_path, "a", encoding="utf-8")
+        if self.dirty:
+            self.flush()
+        atexit.register(self.close)
+
+    @property
+    def _flushing_path(self):
+        return self.journal_path + ".flushing"
+
+    def _reset(self):
+        self._upserts = {table: OrderedDict() for table in TABLES}
+        self._deleted = set()
+        self._deleted_shopping = set()
+
+    @property
+    def dirty(self):
+        return bool(self._deleted or self._deleted_shopping) or any(self._upserts.values())
+
+    def _merge(self, change):
+        for table, rows in change.get("upserts", {}).items():
+            for row in rows:
+                self._upserts[table][row[0]] = row
+                if table == "items":
+                    self._deleted.discard(row[0])
+                elif table == "shopping_list":
+                    self._deleted_shopping.discard(row[0])
+        for item_id in change.get("deleted", ()):
+            self._upserts["items"].pop(item_id, None)
+            self._upserts["item_info"].pop(item_id, None)
+            self._deleted.add(item_id)
+        for row_id in change.get("deleted_shopping", ()):
+            self._upserts["shopping_list"].pop(row_id, None)
+            self._deleted_shopping.add(row_id)
+
+    def _record(self, change):
+        with self._lock:
+            self._journal.write(json.dumps(change) + "\n")
+            self._journal.flush()
+            self._merge(change)
+            if self._timer is None and self.flush_interval > 0:
+                self._timer = threading.Timer(self.flush_interval, self._flush_quietly)
+                self._timer.daemon = True
+                self._timer.start()
+
+    # Same write API as Repository
+    def save_items(self, df):
+        self._record({"upserts": self.repository.item_rows(df)})
+
+    def delete_items(self, ids):
+        self._record({"deleted": [str(item_id) for item_id in ids]})
+
+    def add_used_items(self, records):
+        self._record({"upserts": self.repository.used_rows(records)})
+
+    def save_shopping_items(self, entries):
+        self._record({"upserts": self.repository.shopping_rows(entries),
+                      "deleted_shopping": [i for e in entries for i in e["ids"][1:]]})
+
+    def delete_shopping_items(self, entries):
+        self._record({"deleted_shopping": [i for e in entries for i in e["ids"]]})
+
+    def save_receipts(self, entries):
+        self._record({"upserts": self.repository.receipt_rows(entries)})
+
+    def flush(self):
+        # The journal is moved aside with the batch, so changes recorded while
+        # the batch is being written land in a fresh journal.
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self.dirty:
+                    return
+                upserts = {table: list(rows.values()) for table, rows in self._upserts.items()}
+                deleted = list(self._deleted)
+                deleted_shopping = list(self._deleted_shopping)
+                self._reset()
+                self._journal.close()
+                with open(self.journal_path, encoding="utf-8") as src, \
+                        open(self._flushing_path, "a", encoding="utf-8") as dst:
+                    dst.write(src.read())
+                self._journal = open(self.journal_path, "w", encoding="utf-8")
+            try:
+                self.repository.write(upserts, deleted, deleted_shopping)
+            except Exception:
+                # Put the batch back under anything recorded since
+                with self._lock:
+                    newer_upserts, newer_deleted = self._upserts, self._deleted
+                    newer_deleted_shopping = self._deleted_shopping
+                    self._reset()
+                    self._merge({"upserts": upserts, "deleted": deleted, "deleted_shopping": deleted_shopping})
+                    self._merge({"upserts": {t: list(rows.values()) for t, rows in newer_upserts.items()},
+                                 "deleted": list(newer_deleted), "deleted_shopping": list(newer_deleted_shopping)})
+                raise
+            os.remove(self._flushing_path)
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Write-behind flush failed; changes kept in %s", self.journal_path)
+
+    def close(self):
+        self._flush_quietly()
+        with self._lock:
+            self._journal.close()
+
+    # Reads go to the database, after anything still buffered
+    def load_items(self, mode):
+        self.flush()
+        return self.repository.load_items(mode)
+
+    def load_used_items(self):
+        self.flush()
+        return self.repository.load_used_items()
+
+    def load_shopping_list(self):
+        self.flush()
+        return self.repository.load_shopping_list()
+
+    def load_receipts(self):
+        self.flush()
+        return self.repository.load_receipts()
+
+
+def open_repository(url=DATABASE_URL, user_id=USER_ID):
+    if not url:
+        return None
+    pool, placeholder = connect(url)
+    return Repository(pool, placeholder, user_id)
+
+
+# The store the app writes through: a Repository behind a UnitOfWork
+def open_store(url=DATABASE_URL, user_id=USER_ID, journal_path=JOURNAL_PATH):
+    repository = open_repository(url, user_id)
+    return UnitOfWork(repository, journal_path) if repository else None
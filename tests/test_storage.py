@@ -0,0 +1,146 @@
+"""Round trips through the sqlite store and write-behind crash recovery.
+
+Run with: python -m pytest tests
+"""
+import atexit
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory import receipt_items  # noqa: E402
+from shopping import ShoppingList  # noqa: E402
+from storage import Repository, UnitOfWork, connect, open_store  # noqa: E402
+
+
+class FlakyRepository(Repository):
+    """A Repository whose next `failures` writes raise."""
+
+    failures = 0
+
+    def write(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("database unavailable")
+        super().write(*args, **kwargs)
+
+
+@pytest.fixture
+def repository(tmp_path):
+    pool, placeholder = connect(f"sqlite:///{tmp_path / 'store.db'}")
+    yield FlakyRepository(pool, placeholder)
+    pool.close()
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / "journal.jsonl")
+
+
+def open_unit(repository, journal):
+    store = UnitOfWork(repository, journal, flush_interval=0)
+    atexit.unregister(store.close)
+    return store
+
+
+# Leaves the journal behind, as a process killed before its next flush would
+def crash(store):
+    store._journal.close()
+
+
+def stock(repository, mode="grocery"):
+    df = repository.load_items(mode)
+    return dict(zip(df["Item"], df["Quantity"]))
+
+
+def test_repository_round_trip(repository):
+    items = receipt_items([{"Item": "Milk", "Quantity": 2}, {"Item": "Bread"}], "grocery")
+    repository.save_items(items)
+    loaded = repository.load_items("grocery")
+    assert stock(repository) == {"Milk": 2, "Bread": 1}
+    assert list(loaded.index) == list(items.index)
+    assert (loaded["Expiry Date"] == items["Expiry Date"]).all()
+    assert repository.load_items("pharmacy").empty
+
+    repository.delete_items([items.index[0]])
+    assert stock(repository) == {"Bread": 1}
+
+    repository.add_used_items([{"Item": "Milk", "Category": "Dairy", "Quantity": 1,
+                                "Used On": "2026-01-05", "Type": "grocery"}])
+    assert repository.load_used_items()["Item"].tolist() == ["Milk"]
+
+    shopping = ShoppingList()
+    entries, _ = shopping.add([("Eggs", "Dairy", 6)], "grocery")
+    repository.save_shopping_items(entries)
+    assert [(r["Item"], r["Quantity"]) for r in repository.load_shopping_list()] == [("Eggs", 6)]
+    repository.delete_shopping_items(entries)
+    assert repository.load_shopping_list() == []
+
+
+def test_journal_replayed_after_crash(repository, journal):
+    store = open_unit(repository, journal)
+    items = receipt_items([{"Item": "Milk"}, {"Item": "Bread"}], "grocery")
+    store.save_items(items)
+    store.delete_items([items.index[1]])
+    crash(store)
+    assert stock(repository) == {}
+
+    store = open_unit(repository, journal)
+    assert not store.dirty
+    assert stock(repository) == {"Milk": 1}
+    assert os.path.getsize(journal) == 0
+    assert not os.path.exists(journal + ".flushing")
+    store.close()
+
+
+def test_failed_flush_is_kept_and_retried(repository, journal):
+    store = open_unit(repository, journal)
+    items = receipt_items([{"Item": "Milk"}, {"Item": "Bread"}], "grocery")
+    milk, bread = items.index
+    store.save_items(items)
+
+    repository.failures = 1
+    with pytest.raises(OSError):
+        store.flush()
+    assert store.dirty
+    assert os.path.exists(journal + ".flushing")
+
+    # Changes made after the failure are merged over the failed batch
+    store.save_items(items.loc[[milk]].assign(Quantity=3))
+    store.delete_items([bread])
+    store.flush()
+    assert stock(repository) == {"Milk": 3}
+    assert not store.dirty
+    assert not os.path.exists(journal + ".flushing")
+    store.close()
+
+
+def test_flushing_file_replayed_after_crash(repository, journal):
+    store = open_unit(repository, journal)
+    items = receipt_items([{"Item": "Milk"}, {"Item": "Bread"}], "grocery")
+    store.save_items(items)
+    repository.failures = 1
+    with pytest.raises(OSError):
+        store.flush()
+    store.delete_items([items.index[0]])
+    crash(store)
+
+    # The failed batch is in the .flushing file and the delete in the journal
+    store = open_unit(repository, journal)
+    assert stock(repository) == {"Bread": 1}
+    assert not os.path.exists(journal + ".flushing")
+    store.close()
+
+
+def test_open_store(tmp_path, journal):
+    assert open_store(None, journal_path=journal) is None
+
+    url = f"sqlite:///{tmp_path / 'store.db'}"
+    store = open_store(url, journal_path=journal)
+    atexit.unregister(store.close)
+    store.save_items(receipt_items([{"Item": "Milk", "Quantity": 2}], "grocery"))
+    assert stock(store) == {"Milk": 2}
+    store.close()
+    store.repository.pool.close()
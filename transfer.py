@@ -0,0 +1,201 @@
+"""Bulk import and export of the inventory and used-items history.
+
+Files are CSV or Parquet. Imports are read in chunks, and each chunk is
+validated and typed on its own, so memory is bounded by the chunk size
+plus the rows kept. Exports are written one partition slice at a time
+instead of concatenating the whole inventory first.
+"""
+import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from inventory import (CATEGORIES, COLUMNS, DEFAULT_SHELF_LIFE_DAYS, MODES, SHELF_LIFE_DAYS, USED_COLUMNS,
+                       match_category, typed_inventory, typed_used_items)
+
+FORMATS = ["csv", "parquet"]
+CHUNK_ROWS = 50_000
+# Rejected rows listed individually in an import report
+MAX_REPORTED_ERRORS = 20
+
+_ALLOWED_CATEGORIES = {f"{mode}/{category}" for mode, categories in CATEGORIES.items() for category in categories}
+
+_TIMESTAMP = pa.timestamp("ns")
+ITEM_SCHEMA = pa.schema([
+    ("Item", pa.string()), ("Category", pa.string()), ("Quantity", pa.int32()), ("Purchase Date", _TIMESTAMP),
+    ("Expiry Date", _TIMESTAMP), ("Opened", pa.bool_()), ("Calories", pa.int32()), ("Storage", pa.string()),
+    ("Notes", pa.string()), ("Type", pa.string()), ("Best Before", _TIMESTAMP), ("Use By", _TIMESTAMP),
+    ("Best Stored", pa.string()),
+])
+USED_SCHEMA = pa.schema([
+    ("Item", pa.string()), ("Category", pa.string()), ("Quantity", pa.int32()), ("Used On", _TIMESTAMP),
+    ("Used In", pa.string()), ("Notes", pa.string()), ("Type", pa.string()),
+])
+
+
+def file_format(name):
+    return "parquet" if name.lower().endswith((".parquet", ".pq")) else "csv"
+
+
+class ImportReport:
+    """Counts of imported and rejected rows, with the first few reasons."""
+
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, row_numbers, reason):
+        self.rejected += len(row_numbers)
+        room = MAX_REPORTED_ERRORS - len(self.errors)
+        self.errors.extend(f"Row {number}: {reason}" for number in row_numbers[:max(room, 0)])
+
+
+def read_chunks(source, fmt, columns, chunk_rows=CHUNK_ROWS):
+    """Raw frames of at most `chunk_rows` rows, keeping only known columns."""
+    if fmt == "parquet":
+        parquet = pq.ParquetFile(source)
+        present = [column for column in columns if column in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=present):
+            yield batch.to_pandas()
+    else:
+        # Everything is read as text and converted per column below
+        yield from pd.read_csv(source, chunksize=chunk_rows, dtype=str, keep_default_na=False, na_values=[""],
+                               usecols=lambda column: column in columns)
+
+
+def _text(df, column):
+    return df[column].astype("string").str.strip()
+
+
+def _validate(df, default_mode, report, first_row):
+    """Shared checks: name, mode and the mode's category list.
+
+    Returns the cleaned Item, Type and Category columns, Quantity, and the
+    mask of rows still valid. Missing modes default to `default_mode` and
+    missing categories are guessed from the name, as for receipts.
+    """
+    rows = pd.RangeIndex(first_row, first_row + len(df))
+    item = _text(df, "Item")
+    modes = _text(df, "Type").str.lower().fillna(default_mode)
+    category = _text(df, "Category")
+    guess = category.isna() | (category == "")
+    if guess.any():
+        category[guess] = [match_category(name, mode) for name, mode in zip(item[guess].fillna(""), modes[guess])]
+    quantity = pd.to_numeric(df["Quantity"], errors="coerce")
+    checks = [
+        (item.isna() | (item == ""), "missing item name"),
+        (~modes.isin(MODES), "unknown mode"),
+        (~(modes + "/" + category).isin(_ALLOWED_CATEGORIES), "category isn't one of the mode's categories"),
+        ((quantity.isna() & df["Quantity"].notna()) | (quantity < 1) | (quantity % 1 > 0),
+         "quantity must be a whole number of at least 1"),
+    ]
+    valid = pd.Series(True, index=df.index)
+    for failed, reason in checks:
+        failed = (failed.fillna(True) & valid).to_numpy()
+        report.reject(rows[failed].tolist(), reason)
+        valid &= ~failed
+    return item, modes, category, quantity.fillna(1), valid
+
+
+def _dates(df, column, report, first_row, valid, required=False):
+    dates = pd.to_datetime(df[column], errors="coerce")
+    unreadable = (dates.isna() & (df[column].notna() | required) & valid).to_numpy()
+    report.reject(pd.RangeIndex(first_row, first_row + len(df))[unreadable].tolist(),
+                  f"{'missing or ' if required else ''}unreadable {column}")
+    return dates, valid & ~unreadable
+
+
+def read_items(source, fmt, default_mode, report, chunk_rows=CHUNK_ROWS, today=None):
+    """Typed inventory chunks from a file; bad rows are counted in `report`.
+
+    Every imported item gets a new ID. An item without an expiry date gets
+    the same default shelf life as a receipt line.
+    """
+    today = pd.Timestamp(today or datetime.date.today())
+    first_row = 1
+    for raw in read_chunks(source, fmt, COLUMNS, chunk_rows):
+        df = raw.reindex(columns=COLUMNS)
+        item, modes, category, quantity, valid = _validate(df, default_mode, report, first_row)
+        purchase, valid = _dates(df, "Purchase Date", report, first_row, valid)
+        expiry, valid = _dates(df, "Expiry Date", report, first_row, valid)
+        best_before, valid = _dates(df, "Best Before", report, first_row, valid)
+        use_by, valid = _dates(df, "Use By", report, first_row, valid)
+        purchase = purchase.fillna(today)
+        shelf_life = category.map(SHELF_LIFE_DAYS).fillna(modes.map(DEFAULT_SHELF_LIFE_DAYS)).fillna(14)
+        expiry = expiry.fillna(purchase + pd.to_timedelta(shelf_life.astype(float), unit="D"))
+        first_row += len(df)
+        if not valid.any():
+            continue
+        chunk = typed_inventory(pd.DataFrame({
+            "Item": item,
+            "Category": category,
+            "Quantity": quantity,
+            "Purchase Date": purchase,
+            "Expiry Date": expiry,
+            "Opened": df["Opened"].astype("string").str.strip().str.lower().isin(["true", "1", "yes"]),
+            "Calories": pd.to_numeric(df["Calories"], errors="coerce").fillna(0).round(),
+            "Storage": _text(df, "Storage").fillna(""),
+            "Notes": _text(df, "Notes").fillna(""),
+            "Type": modes,
+            "Best Before": best_before.fillna(expiry),
+            "Use By": use_by.fillna(expiry),
+            "Best Stored": _text(df, "Best Stored").fillna(""),
+        })[valid.to_numpy()].reset_index(drop=True))
+        report.imported += len(chunk)
+        yield chunk
+
+
+def read_used_items(source, fmt, default_mode, report, chunk_rows=CHUNK_ROWS):
+    """Typed used-item chunks from a file; rows need a readable Used On date."""
+    first_row = 1
+    for raw in read_chunks(source, fmt, USED_COLUMNS, chunk_rows):
+        df = raw.reindex(columns=USED_COLUMNS)
+        item, modes, category, quantity, valid = _validate(df, default_mode, report, first_row)
+        used_on, valid = _dates(df, "Used On", report, first_row, valid, required=True)
+        first_row += len(df)
+        if not valid.any():
+            continue
+        chunk = typed_used_items(pd.DataFrame({
+            "Item": item,
+            "Category": category,
+            "Quantity": quantity,
+            "Used On": used_on.dt.normalize(),
+            "Used In": _text(df, "Used In").fillna("Not specified"),
+            "Notes": _text(df, "Notes").fillna(""),
+            "Type": modes,
+        })[valid.to_numpy()])
+        report.imported += len(chunk)
+        yield chunk
+
+
+def _slices(frames, chunk_rows):
+    for df in frames:
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+
+def write_frames(frames, target, fmt, schema, chunk_rows=CHUNK_ROWS):
+    """Writes typed frames (e.g. one per mode) to a path or binary file."""
+    columns = schema.names
+    if fmt == "parquet":
+        with pq.ParquetWriter(target, schema) as writer:
+            for df in _slices(frames, chunk_rows):
+                df = df[columns].astype({"Category": "string", "Type": "string"})
+                writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+        return
+    if isinstance(target, str):
+        with open(target, "wb") as f:
+            return write_frames(frames, f, fmt, schema, chunk_rows)
+    pd.DataFrame(columns=columns).to_csv(target, index=False)
+    for df in _slices(frames, chunk_rows):
+        df[columns].to_csv(target, header=False, index=False, date_format="%Y-%m-%d")
+
+
+def write_items(inventory, target, fmt, chunk_rows=CHUNK_ROWS):
+    write_frames([inventory.items(mode) for mode in MODES], target, fmt, ITEM_SCHEMA, chunk_rows)
+
+
+def write_used_items(used_items, target, fmt, chunk_rows=CHUNK_ROWS):
+    write_frames([used_items.frame()], target, fmt, USED_SCHEMA, chunk_rows)